@@ -0,0 +1,52 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DIRECTORY_PREFIX = 'companies:directory'
+GENERATION_KEY = f'{DIRECTORY_PREFIX}:generation'
+CHANGED_AT_KEY = f'{DIRECTORY_PREFIX}:changed_at'
+
+
+def _directory_ttl():
+    return getattr(settings, 'COMPANY_DIRECTORY_CACHE_TTL', 300)
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def directory_state():
+    """
+    Return (generation, changed_at): the counter bumped by every company change and the time of the last bump.
+    """
+    values = cache.get_many([GENERATION_KEY, CHANGED_AT_KEY])
+    return values.get(GENERATION_KEY, 0), values.get(CHANGED_AT_KEY, 0)
+
+
+def bump_directory_generation():
+    """
+    Make every cached directory page unreachable. Called after a company is saved or deleted.
+    """
+    _incr(GENERATION_KEY)
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+def directory_page_key(generation, scheme, host, cursor, page_size):
+    # The cached page holds absolute next/previous links, they depend on the scheme and host
+    page = hashlib.md5(f'{scheme}|{host}|{cursor}|{page_size}'.encode('utf-8')).hexdigest()
+    return f'{DIRECTORY_PREFIX}:{generation}:{page}'
+
+
+def get_cached_page(key):
+    return cache.get(key)
+
+
+def set_cached_page(key, page):
+    cache.set(key, page, _directory_ttl())
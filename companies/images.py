@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# اسم النسخة -> أكبر طول للضلع بالبكسل (مع الحفاظ على نسبة الأبعاد)
+VARIANT_SIZES = {
+    'thumb': 64,
+    'small': 256,
+    'medium': 512,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIRECTORY = 'variants'
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            thread_name_prefix='image-variants'
+        )
+    return _executor
+
+
+def variant_name(image_name, label, extension):
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, VARIANTS_DIRECTORY, f'{stem}_{label}.{extension}')
+
+
+def render_variants(storage, image_name):
+    """
+    Resize the stored image into every size and format of VARIANT_SIZES x VARIANT_FORMATS.
+    Return {'<label>_<extension>': stored name}.
+    """
+    with storage.open(image_name, 'rb') as file:
+        with Image.open(file) as opened:
+            original = ImageOps.exif_transpose(opened)
+            original.load()
+
+    variants = {}
+    for label, size in VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            image = resized
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            name = storage.save(variant_name(image_name, label, extension), ContentFile(buffer.getvalue()))
+            variants[f'{label}_{extension}'] = name
+    return variants
+
+
+def delete_files(storage, names):
+    for name in names:
+        if name:
+            storage.delete(name)
+
+
+def generate_company_variants(company_id, image_name):
+    """
+    Build the variants of a company image and store their names on the company.
+    Nothing is stored if the image was replaced in the meantime; the new image has its own job.
+    """
+    from .cache import bump_directory_generation
+    from .models import Company
+
+    storage = Company._meta.get_field('image').storage
+    try:
+        variants = render_variants(storage, image_name)
+    except (OSError, UnidentifiedImageError):
+        return {}
+    updated = Company.objects.filter(pk=company_id, image=image_name).update(image_variants=variants)
+    if not updated:
+        delete_files(storage, variants.values())
+        return {}
+    bump_directory_generation()
+    return variants
+
+
+def _run_in_worker(company_id, image_name):
+    close_old_connections()
+    try:
+        generate_company_variants(company_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_company_variants(company):
+    """
+    Queue the variants of the company's current image once the transaction commits.
+    """
+    args = (company.pk, company.image.name)
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, *args))
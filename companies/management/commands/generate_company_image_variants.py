@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from companies.images import delete_files, generate_company_variants
+from companies.models import Company
+
+
+class Command(BaseCommand):
+    help = "Build the resized WebP/JPEG variants of company images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true', help="Skip companies that already have variants")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants').order_by('pk')
+        if options['missing_only']:
+            companies = companies.filter(image_variants={})
+        storage = Company._meta.get_field('image').storage
+        generated = 0
+        for company in companies.iterator():
+            variants = generate_company_variants(company.pk, company.image.name)
+            if not variants:
+                self.stderr.write(f"Could not build the variants of company {company.pk}.")
+                continue
+            delete_files(storage, set((company.image_variants or {}).values()) - set(variants.values()))
+            generated += 1
+
+        if generated > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully built the variants of {generated} companies."))
+        else:
+            self.stdout.write("No company images to process.")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from companies.models import Company
+from companies.search import index_companies
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search document and the prefix tokens of companies"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        companies = Company.objects.only('id', 'name', 'location', 'search_document').order_by('pk')
+        chunk_size = options['chunk_size']
+        indexed = 0
+        last_pk = 0
+        while True:
+            chunk = list(companies.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            index_companies(chunk)
+            indexed += len(chunk)
+
+        if indexed > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully indexed {indexed} companies."))
+        else:
+            self.stdout.write("No companies to index.")
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:18
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of ramcompany.search.tokenize as it was when this migration was written,
+# so later changes to the tokenizer do not change what this migration does.
+MAX_TOKEN_LENGTH = 64
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+def tokenize(*parts):
+    tokens = []
+    for part in parts:
+        for token in normalize(part).split():
+            token = token[:MAX_TOKEN_LENGTH]
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def build_search_index(apps, schema_editor):
+    Company = apps.get_model('companies', 'Company')
+    CompanySearchToken = apps.get_model('companies', 'CompanySearchToken')
+    last_pk = 0
+    while True:
+        companies = list(Company.objects.filter(pk__gt=last_pk).order_by('pk')[:500])
+        if not companies:
+            break
+        tokens = []
+        for company in companies:
+            words = tokenize(company.name, company.location)
+            company.search_document = ' '.join(words)[:512]
+            tokens.extend(CompanySearchToken(company_id=company.pk, token=word) for word in words)
+        Company.objects.bulk_update(companies, ['search_document'])
+        CompanySearchToken.objects.bulk_create(tokens, batch_size=1000)
+        last_pk = companies[-1].pk
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX companies_company_search_ft ON companies_company (search_document)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX companies_company_search_ft ON companies_company')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_alter_company_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='search_document',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.CreateModel(
+            name='CompanySearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'company'], name='companies_c_token_ee9926_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0004_company_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
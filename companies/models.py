@@ -1,13 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from phonenumber_field.modelfields import PhoneNumberField
 from django.utils import timezone 
+from ramcompany.dirty_fields import DirtyFieldsMixin
+from .cache import bump_directory_generation
 
 
-class Company(models.Model):
+class Company(DirtyFieldsMixin, models.Model):
     owner = models.OneToOneField(User , on_delete=models.CASCADE ,related_name='company_profile')
     name = models.CharField(max_length = 255 ,verbose_name = "company name" , null = False ,unique = True)
     image = models.ImageField(upload_to = 'companies_images/' ,null = True)
+    # أسماء النسخ المصغرة من الصورة ('thumb_webp' -> الملف)، تُبنى في الخلفية بعد الحفظ
+    image_variants = models.JSONField(default = dict , blank = True)
     location = models.CharField(max_length = 255 , null = True)
     phone_number = PhoneNumberField(null = False , blank = True ,unique = True)
     description = models.TextField(null = True)
@@ -17,16 +21,35 @@ class Company(models.Model):
     updated_at = models.DateTimeField(auto_now = True)
     is_active = models.BooleanField(default = True)
     deleted_at = models.DateTimeField(null = True , blank = True)
+    # الاسم والموقع بعد التوحيد، للبحث والإكمال التلقائي - يتم بناؤه في save
+    search_document = models.CharField(max_length = 512 , blank = True , default = '')
     def save(self, *args, **kwargs):
-        try:
-            old_instance = Company.objects.get(pk=self.pk)
-            if old_instance.image and old_instance.image != self.image:
-                old_instance.image.delete(save=False)
-        except Company.DoesNotExist:
-            pass
-        
-        super().save(*args, **kwargs)
+        from .images import delete_files, schedule_company_variants
+        from .search import build_search_document, index_companies
+        self.search_document = build_search_document(self)
+        if 'image' in self.get_dirty_fields() and self.image_variants:
+            # النسخ القديمة تخص الصورة القديمة، تحذف معها بعد الحفظ
+            self.image_variants = {}
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'search_document'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if 'search_document' in self.saved_changes:
+                index_companies([self], update_documents=False)
+        if not self.saved_changes:
+            return
+        if 'image' in self.saved_changes:
+            old_files = [self.saved_changes['image'], *(self.saved_changes.get('image_variants') or {}).values()]
+            storage = self.image.storage
+            transaction.on_commit(lambda: delete_files(storage, old_files))
+            if self.image:
+                schedule_company_variants(self)
+        transaction.on_commit(bump_directory_generation)
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(bump_directory_generation)
+        return result
 
     def __str__(self):
         return self.name
@@ -46,5 +69,16 @@ class Company(models.Model):
         verbose_name = "Company"
         verbose_name_plural = "Companies"
         ordering = ['-created_at']
-    
 
+
+class CompanySearchToken(models.Model):
+    """
+    كلمة واحدة من نص البحث لكل صف، حتى يستخدم البحث بالبادئة (LIKE 'abc%') الفهرس.
+    """
+    company = models.ForeignKey(Company , on_delete = models.CASCADE , related_name = "search_tokens")
+    token = models.CharField(max_length = 64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ['token' , 'company']),
+        ]
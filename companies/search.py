@@ -0,0 +1,51 @@
+from ramcompany.search import fulltext_ranked, query_tokens, token_ranked, tokenize, use_fulltext
+from .models import Company, CompanySearchToken
+
+TOKEN_BATCH_SIZE = 1000
+MAX_AUTOCOMPLETE_RESULTS = 20
+
+
+def company_tokens(company):
+    return tokenize(company.name, company.location)
+
+
+def build_search_document(company):
+    return ' '.join(company_tokens(company))[:512]
+
+
+def index_companies(companies, update_documents=True):
+    """
+    Rebuild the search document and the prefix tokens of many companies with set-based writes.
+    """
+    companies = list(companies)
+    if not companies:
+        return
+    if update_documents:
+        for company in companies:
+            company.search_document = build_search_document(company)
+        Company.objects.bulk_update(companies, ['search_document'], batch_size=TOKEN_BATCH_SIZE)
+    CompanySearchToken.objects.filter(company__in=[company.pk for company in companies]).delete()
+    CompanySearchToken.objects.bulk_create(
+        [
+            CompanySearchToken(company_id=company.pk, token=token)
+            for company in companies
+            for token in company_tokens(company)
+        ],
+        batch_size=TOKEN_BATCH_SIZE
+    )
+
+
+def search_company_ids(query):
+    """
+    Return a values queryset of {'company_id', 'rank'} for the active companies, best match first.
+    Every query token must match the start of a word of the name or the location.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+
+    if use_fulltext(tokens):
+        return fulltext_ranked(Company.objects.filter(is_active=True), tokens, 'company_id')
+
+    matches = CompanySearchToken.objects.filter(company__is_active=True)
+    return token_ranked(matches, tokens, 'company_id')
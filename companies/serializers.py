@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Company
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from ramcompany.uniqueness import find_existing
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from ramcompany.last_login import record_login
 
 
 class CompanyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -16,16 +18,27 @@ class CompanyTokenObtainPairSerializer(TokenObtainPairSerializer):
             raise serializers.ValidationError(
                 {"detail": "This login is for company owners only."}
             )
-
+        record_login(self.user)
         return data
 
 class CompanySerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     company_id = serializers.IntegerField(source='id', read_only=True)
+    image_variants = serializers.SerializerMethodField()
     class Meta:
         model = Company
-        fields = ['company_id', 'owner', 'name', 'image', 'location', 'phone_number', 'description', 'email', 'website', 'created_at', 'updated_at']
-        read_only_fields = ['company_id', 'owner', 'created_at', 'updated_at']
+        fields = ['company_id', 'owner', 'name', 'image', 'image_variants', 'location', 'phone_number', 'description', 'email', 'website', 'created_at', 'updated_at']
+        read_only_fields = ['company_id', 'owner', 'image_variants', 'created_at', 'updated_at']
+
+    def get_image_variants(self, obj):
+        # نفس شكل رابط الصورة الأصلية: رابط كامل إذا كان الطلب متاحاً
+        storage = obj.image.storage
+        request = self.context.get('request')
+        urls = {}
+        for label, name in (obj.image_variants or {}).items():
+            url = storage.url(name)
+            urls[label] = request.build_absolute_uri(url) if request is not None else url
+        return urls
 
 
 class CompanySignUpSerializer(serializers.ModelSerializer):
@@ -43,44 +56,70 @@ class CompanySignUpSerializer(serializers.ModelSerializer):
             'phone_number': {'validators': []},
             'email': {'validators': []},
         }
+    uniqueness_messages = {
+        'username': ('username', 'A user with that username already exists.'),
+        'user_email': ('email', 'This email is already associated with another user.'),
+        'company_email': ('email', 'This email is already associated with another company.'),
+        'name': ('name', 'A company with this name already exists.'),
+        'phone_number': ('phone_number', 'This phone number is already registered to another company.'),
+    }
+
+    def uniqueness_errors(self, data):
+        """
+        Check every unique value of the signup in one query.
+        """
+        checks = {}
+        if data.get('username'):
+            checks['username'] = User.objects.filter(username=data['username'])
+        if data.get('email'):
+            checks['user_email'] = User.objects.filter(email=data['email'])
+            checks['company_email'] = Company.objects.filter(email=data['email'])
+        if data.get('name'):
+            checks['name'] = Company.objects.filter(name=data['name'])
+        if data.get('phone_number'):
+            checks['phone_number'] = Company.objects.filter(phone_number=data['phone_number'])
+        taken = find_existing(checks)
+        errors = {}
+        # company_email comes after user_email so it wins, as it did before
+        for label, (field, message) in self.uniqueness_messages.items():
+            if label in taken:
+                errors[field] = message
+        return errors
+
     def validate(self, data):
         errors = {}
         if not data.get('username'):
             errors['username'] = 'This field may not be blank.'
-        elif User.objects.filter(username=data['username']).exists():
-            errors['username'] = 'A user with that username already exists.'
         if not data.get('email'):
             errors['email'] = 'This field may not be blank.'
-        else:
-            if User.objects.filter(email=data['email']).exists():
-                errors['email'] = 'This email is already associated with another user.'
-            if Company.objects.filter(email=data['email']).exists():
-                errors['email'] = 'This email is already associated with another company.'
         if not data.get('password') or not data.get('password2'):
             errors['password'] = 'Both password fields are required.'
         elif data['password'] != data['password2']:
             errors['password'] = 'The two password fields did not match.'
         if not data.get('name'):
             errors['name'] = 'Company name may not be blank.'
-        elif Company.objects.filter(name=data['name']).exists():
-            errors['name'] = 'A company with this name already exists.'
-        if 'phone_number' in data and data.get('phone_number'):
-            if Company.objects.filter(phone_number=data['phone_number']).exists():
-                errors['phone_number'] = 'This phone number is already registered to another company.'
+        for field, message in self.uniqueness_errors(data).items():
+            errors.setdefault(field, message)
         if errors:
             raise serializers.ValidationError(errors)
         return data
         
     def create(self, validated_data):
-        with transaction.atomic():
-            user_data = {
-                'username': validated_data.pop('username'),
-                'password': validated_data.pop('password')
-            }
-            validated_data.pop('password2')
-            user = User.objects.create_user(**user_data)
-            company = Company.objects.create(owner=user, **validated_data)
-            return company
+        lookup = dict(validated_data)
+        try:
+            with transaction.atomic():
+                user_data = {
+                    'username': validated_data.pop('username'),
+                    'password': validated_data.pop('password')
+                }
+                validated_data.pop('password2')
+                user = User.objects.create_user(**user_data)
+                company = Company.objects.create(owner=user, **validated_data)
+                return company
+        except IntegrityError:
+            # سباق مع تسجيل آخر: القيود الفريدة في قاعدة البيانات رفضت الإدخال
+            errors = self.uniqueness_errors(lookup)
+            raise serializers.ValidationError(errors or {'detail': 'This account could not be created, please try again.'})
 
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required = True , write_only = True)
@@ -1,3 +1,306 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models.signals import post_save, pre_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from employees.models import Employee
+from ramcompany.throttling import throttle_cache
+from salaries.models import SalaryAdjustment, SalaryContract
+from .images import generate_company_variants
+from .models import Company
+from .serializers import CompanySerializer
+
+
+def create_company(username='owner', phone_number='+963944000001', **fields):
+    fields.setdefault('name', f'{username} company')
+    return Company.objects.create(
+        owner=User.objects.create_user(username, password='owner-pass'),
+        phone_number=phone_number,
+        **fields
+    )
+
+
+class DirtyFieldsTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company(location='Damascus City', description='Old')
+
+    def test_loaded_company_has_no_dirty_fields(self):
+        company = Company.objects.get(pk=self.company.pk)
+        self.assertEqual(company.get_dirty_fields(), {})
+        company.description = 'New'
+        self.assertEqual(company.get_dirty_fields(), {'description': 'Old'})
+
+    def test_save_writes_only_the_changed_columns(self):
+        company = Company.objects.get(pk=self.company.pk)
+        company.description = 'New'
+        with CaptureQueriesContext(connection) as queries:
+            company.save()
+        update = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('"description"', update)
+        self.assertNotIn('"location"', update)
+        self.assertEqual(company.saved_changes, {'description': 'Old'})
+
+    def test_refresh_from_db_takes_a_new_snapshot(self):
+        Company.objects.filter(pk=self.company.pk).update(location='Aleppo')
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.location, 'Aleppo')
+        self.assertEqual(self.company.get_dirty_fields(), {})
+
+        self.company.description = 'New'
+        self.company.save()
+        self.assertEqual(self.company.saved_changes['description'], 'Old')
+        self.assertNotIn('location', self.company.saved_changes)
+
+    def test_refresh_of_some_fields_only_resets_those_fields(self):
+        Company.objects.filter(pk=self.company.pk).update(location='Aleppo')
+        self.company.description = 'New'
+        self.company.refresh_from_db(fields=['location'])
+        self.assertEqual(self.company.get_dirty_fields(), {'description': 'Old'})
+
+    def test_refresh_after_another_writer_replaced_the_image_keeps_its_variants(self):
+        variants = {'thumb_webp': 'companies_images/variants/new_thumb.webp'}
+        Company.objects.filter(pk=self.company.pk).update(image='companies_images/new.png', image_variants=variants)
+        self.company.refresh_from_db()
+
+        self.company.description = 'New'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.company.save()
+
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.image_variants, variants)
+        self.assertNotIn('image', self.company.saved_changes)
+        # Only the directory bump, no image delete and no variant job
+        self.assertEqual(len(callbacks), 1)
+
+
+class NoOpSaveTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.company = create_company(location='Damascus')
+        self.client = APIClient()
+
+    def test_no_receiver_depends_on_the_save_of_tracked_models(self):
+        # A no-op save sends no signal, a receiver added to these models must handle that
+        for model in (Company, Employee, SalaryContract, SalaryAdjustment):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(pre_save.has_listeners(model))
+                self.assertFalse(post_save.has_listeners(model))
+
+    def test_unchanged_save_keeps_updated_at_and_the_directory_etag(self):
+        first = self.client.get('/company/all/')
+        company = Company.objects.get(pk=self.company.pk)
+        updated_at = company.updated_at
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            company.save()
+
+        # Only the savepoint of Company.save, no write
+        self.assertFalse([query for query in queries.captured_queries if 'SAVEPOINT' not in query['sql']])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Company.objects.get(pk=company.pk).updated_at, updated_at)
+        second = self.client.get('/company/all/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_changed_save_moves_updated_at_and_the_directory_etag(self):
+        first = self.client.get('/company/all/')
+        company = Company.objects.get(pk=self.company.pk)
+        company.location = 'Aleppo'
+        with self.captureOnCommitCallbacks(execute=True):
+            company.save()
+
+        self.assertGreater(Company.objects.get(pk=company.pk).updated_at, self.company.updated_at)
+        second = self.client.get('/company/all/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data['results'][0]['location'], 'Aleppo')
+
+
+class CompanyDirectoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.companies = [create_company(f'owner{index}', f'+96394400000{index}') for index in range(3)]
+        self.client = APIClient()
+
+    def test_lists_only_active_companies(self):
+        Company.objects.filter(pk=self.companies[0].pk).update(is_active=False)
+        response = self.client.get('/company/all/')
+        self.assertEqual([row['company_id'] for row in response.data['results']], [self.companies[2].pk, self.companies[1].pk])
+
+    def test_cached_page_links_follow_the_request_scheme(self):
+        plain = self.client.get('/company/all/', {'page_size': 1})
+        secure = self.client.get('/company/all/', {'page_size': 1}, secure=True)
+        self.assertTrue(plain.data['next'].startswith('http://'))
+        self.assertTrue(secure.data['next'].startswith('https://'))
+
+    def test_saving_a_company_invalidates_the_cached_page(self):
+        first = self.client.get('/company/all/')
+        company = Company.objects.get(pk=self.companies[0].pk)
+        company.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            company.save()
+
+        second = self.client.get('/company/all/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn(company.pk, [row['company_id'] for row in second.data['results']])
+
+    def test_last_modified_revalidates_with_if_modified_since(self):
+        first = self.client.get('/company/all/')
+        self.assertIn('Last-Modified', first)
+        second = self.client.get('/company/all/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, 304)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        throttle_cache.clear()
+        self.company = create_company()
+        self.client = APIClient()
+
+    def login(self, password, ip='10.0.0.1', username='owner'):
+        return self.client.post('/api/login/', {'username': username, 'password': password}, format='json', REMOTE_ADDR=ip)
+
+    def test_successful_logins_are_not_counted(self):
+        for _ in range(7):
+            self.assertEqual(self.login('owner-pass').status_code, 200)
+
+    def test_failed_logins_throttle_the_username_from_that_ip(self):
+        for _ in range(5):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('wrong').status_code, 429)
+        self.assertEqual(self.login('owner-pass').status_code, 429)
+
+    def test_failures_from_another_ip_do_not_lock_the_owner_out(self):
+        for _ in range(6):
+            self.login('wrong', ip='10.0.0.66')
+        self.assertEqual(self.login('owner-pass').status_code, 200)
+        self.assertEqual(self.login('wrong', ip='10.0.0.66', username='someone-else').status_code, 401)
+
+
+class CompanySearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.bakery = create_company('baker', '+963944000001', name='Golden Bakery', location='Damascus')
+        self.bank = create_company('banker', '+963944000002', name='Damascus Bank', location='Aleppo')
+        self.cafe = create_company('barista', '+963944000003', name='مقهى الشام', location='Homs')
+
+    def search(self, query, **params):
+        response = self.client.get('/company/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['company_id'] for row in response.data['results']]
+
+    def test_every_word_must_prefix_the_name_or_location(self):
+        self.assertEqual(self.search('gold dam'), [self.bakery.pk])
+        self.assertEqual(self.search('bank alep'), [self.bank.pk])
+        self.assertEqual(self.search('gold aleppo'), [])
+        self.assertEqual(self.search('الش'), [self.cafe.pk])
+
+    def test_exact_words_rank_first(self):
+        prefix_only = create_company('other', '+963944000004', name='Damascusline', location='Tartus')
+        self.assertEqual(self.search('damascus'), [self.bakery.pk, self.bank.pk, prefix_only.pk])
+
+    def test_case_and_accents_are_ignored(self):
+        Company.objects.filter(pk=self.bank.pk).update(name='Café Bank')
+        company = Company.objects.get(pk=self.bank.pk)
+        company.location = 'ALEPPO'
+        company.save()
+        self.assertEqual(self.search('cafe aleppo'), [self.bank.pk])
+
+    def test_inactive_companies_and_empty_queries_return_nothing(self):
+        Company.objects.filter(pk=self.bakery.pk).update(is_active=False)
+        self.assertEqual(self.search('golden'), [])
+        self.assertEqual(self.search(' - '), [])
+
+    def test_limit_caps_the_results(self):
+        self.assertEqual(len(self.search('damascus', limit=1)), 1)
+        response = self.client.get('/company/search/', {'q': 'damascus', 'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+
+def png_upload(name='logo.png', size=(800, 400)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 255)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class CompanyImageVariantTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.company = create_company()
+        self.storage = Company._meta.get_field('image').storage
+
+    def upload(self, name='logo.png'):
+        company = Company.objects.get(pk=self.company.pk)
+        company.image = png_upload(name)
+        # The variant job runs in a thread pool, the tests call it directly
+        with mock.patch('companies.images.schedule_company_variants') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            company.save()
+        schedule.assert_called_once_with(company)
+        return company
+
+    def test_variants_are_resized_and_stored_on_the_company(self):
+        company = self.upload()
+
+        variants = generate_company_variants(company.pk, company.image.name)
+
+        self.assertEqual(sorted(variants), [
+            'medium_jpeg', 'medium_webp', 'small_jpeg', 'small_webp', 'thumb_jpeg', 'thumb_webp'
+        ])
+        self.assertEqual(Company.objects.get(pk=company.pk).image_variants, variants)
+        with self.storage.open(variants['thumb_webp']) as file, Image.open(file) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ('WEBP', (64, 32)))
+        with self.storage.open(variants['medium_jpeg']) as file, Image.open(file) as medium:
+            self.assertEqual((medium.format, medium.size), ('JPEG', (512, 256)))
+
+    def test_serializer_returns_variant_urls(self):
+        company = self.upload()
+        variants = generate_company_variants(company.pk, company.image.name)
+
+        data = CompanySerializer(Company.objects.get(pk=company.pk)).data
+
+        self.assertEqual(data['image_variants']['small_webp'], self.storage.url(variants['small_webp']))
+
+    def test_replacing_the_image_deletes_the_old_files(self):
+        company = self.upload()
+        old_image = company.image.name
+        old_variants = generate_company_variants(company.pk, old_image)
+
+        company = self.upload('new-logo.png')
+
+        self.assertEqual(company.image_variants, {})
+        self.assertEqual(Company.objects.get(pk=company.pk).image_variants, {})
+        for name in (old_image, *old_variants.values()):
+            self.assertFalse(self.storage.exists(name), name)
+        self.assertTrue(self.storage.exists(company.image.name))
+
+    def test_job_for_a_replaced_image_stores_nothing(self):
+        old_image = self.upload().image.name
+        # Replaced after the job was queued, the old file is not deleted yet
+        Company.objects.filter(pk=self.company.pk).update(image='companies_images/other.png')
+
+        self.assertEqual(generate_company_variants(self.company.pk, old_image), {})
+
+        self.assertEqual(Company.objects.get(pk=self.company.pk).image_variants, {})
+        self.assertEqual(self.storage.listdir('companies_images/variants')[1], [])
@@ -1,15 +1,24 @@
+import hashlib
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from .models import Company
+from .search import MAX_AUTOCOMPLETE_RESULTS, search_company_ids
+from .cache import directory_page_key, directory_state, get_cached_page, set_cached_page
+from ramcompany.pagination import StandardCursorPagination
 from .serializers import CompanySerializer, CompanySignUpSerializer ,CompanyTokenObtainPairSerializer,ChangePasswordSerializer
 from .permissions import IsOwnerOrReadOnly
+from ramcompany.principal import get_principal
+from ramcompany.throttling import LOGIN_THROTTLES, PasswordChangeRateThrottle, RegisterRateThrottle
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterRateThrottle])
 def register_company(request):
     serializer = CompanySignUpSerializer(data=request.data)
     if serializer.is_valid():
@@ -19,8 +28,9 @@ def register_company(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def company_login(request):
-    serializer = CompanyTokenObtainPairSerializer(data=request.data)
+    serializer = CompanyTokenObtainPairSerializer(data=request.data, context={'request': request})
     serializer.is_valid(raise_exception=True)    
     return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
@@ -28,9 +38,65 @@ def company_login(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_companies(request):
-    companies = Company.objects.all()
-    serializer = CompanySerializer(companies, many=True)
-    return Response(serializer.data)
+    """
+    Public directory of the active companies, cursor-paginated.
+    Pages are cached until a company changes and can be revalidated with If-None-Match / If-Modified-Since.
+    """
+    generation, changed_at = directory_state()
+    key = directory_page_key(
+        generation,
+        request.scheme,
+        request.get_host(),
+        request.query_params.get('cursor', ''),
+        request.query_params.get('page_size', '')
+    )
+    page = get_cached_page(key)
+    if page is None:
+        paginator = StandardCursorPagination()
+        companies = paginator.paginate_queryset(Company.objects.filter(is_active=True).select_related('owner'), request)
+        serializer = CompanySerializer(companies, many=True)
+        versions = '|'.join(f'{company.pk}:{company.updated_at.isoformat()}' for company in companies)
+        page = {
+            'data': paginator.get_paginated_response(serializer.data).data,
+            'etag': quote_etag(hashlib.md5(f'{generation}|{versions}'.encode('utf-8')).hexdigest()),
+            'last_modified': max((company.updated_at.timestamp() for company in companies), default=0),
+        }
+        set_cached_page(key, page)
+
+    # A company leaving the directory does not change the updated_at of the remaining ones
+    last_modified = int(max(page['last_modified'], changed_at)) or None
+    not_modified = get_conditional_response(request._request, etag=page['etag'], last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = page['etag']
+        return not_modified
+    response = Response(page['data'])
+    response['ETag'] = page['etag']
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0)
+    return response
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_companies(request):
+    """
+    Autocomplete over the names and locations of the active companies.
+    ?q= is matched word by word as prefixes, ?limit= caps the results (10 by default).
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), MAX_AUTOCOMPLETE_RESULTS)
+    except ValueError:
+        return Response({"detail": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+    ranked = search_company_ids(request.query_params.get('q', ''))
+    if ranked is None:
+        return Response({'results': []})
+    ids = [row['company_id'] for row in ranked[:limit]]
+    companies = Company.objects.only('id', 'name', 'location').in_bulk(ids)
+    results = [
+        {'company_id': company_id, 'name': companies[company_id].name, 'location': companies[company_id].location}
+        for company_id in ids if company_id in companies
+    ]
+    return Response({'results': results})
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -49,7 +115,7 @@ def delete_company_profile(request, pk):
         company_to_delete = Company.objects.get(pk=pk)
     except Company.DoesNotExist:
         return Response( {"detail": "no company"}, status=status.HTTP_404_NOT_FOUND)
-    is_owner = (request.user == company_to_delete.owner)
+    is_owner = get_principal(request).owns_company(company_to_delete.pk)
     is_admin = (request.user.is_staff)
     if not is_owner and not is_admin:
         return Response(
@@ -68,10 +134,9 @@ def delete_company_profile(request, pk):
 @api_view(['PUT','PATCH'])
 @permission_classes([IsAuthenticated, IsOwnerOrReadOnly])
 def update_company(request):
-    try:
-        company = request.user.company_profile
-    except Company.DoesNotExist:
-        return Response({detail :"No User's Company "},status = status.HTTP404_NOT_FOUND)
+    company = get_principal(request).company
+    if company is None:
+        return Response({"detail" :"No User's Company "},status = status.HTTP_404_NOT_FOUND)
     serializer = CompanySerializer(company, data=request.data, partial=request.method == 'PATCH')
     if serializer.is_valid():
         serializer.save()
@@ -81,6 +146,7 @@ def update_company(request):
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PasswordChangeRateThrottle])
 def change_password(request):
     user = request.user
     serializer = ChangePasswordSerializer(data = request.data , context = {"request" : request})
@@ -0,0 +1,181 @@
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import Employee, EmploymentRequest
+from .search import build_search_document, index_employees
+
+CSV_COLUMNS = ['username', 'email', 'password', 'first_name', 'last_name', 'phone_number']
+REQUIRED_COLUMNS = ['username', 'email', 'password']
+IMPORT_CHUNK_SIZE = 500
+# الحد الأعلى لعدد الصفوف في طلب HTTP واحد (كل كلمة مرور تأخذ نصف ثانية تقريباً)،
+# الملفات الأكبر تستورد بأمر import_employees
+MAX_IMPORT_ROWS = 200
+# تشغيل مجمع العمليات مكلف، لذلك الدفعات الصغيرة تُشفَّر في نفس العملية
+MIN_ROWS_PER_HASH_WORKER = 50
+
+
+def read_employee_csv(file):
+    """
+    Parse an uploaded or opened CSV file into a list of row dicts keyed by CSV_COLUMNS.
+    Raise ValidationError when the header is missing a required column.
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValidationError(f"Missing CSV columns: {', '.join(missing)}.")
+    return [
+        {column: (row.get(column) or '').strip() for column in CSV_COLUMNS}
+        for row in reader
+    ]
+
+
+def _validate_rows(rows):
+    """
+    Check every row on its own and against the rest of the batch.
+    Return {row_number: {field: message}} for the rows that must be skipped.
+    Row numbers start at 2 to match the line in the CSV file (line 1 is the header).
+    """
+    errors = {}
+    seen = {'username': {}, 'email': {}, 'phone_number': {}}
+    for number, row in enumerate(rows, start=2):
+        row_errors = {}
+        for column in REQUIRED_COLUMNS:
+            if not row[column]:
+                row_errors[column] = 'This field may not be blank.'
+        if row['email'] and 'email' not in row_errors:
+            try:
+                validate_email(row['email'])
+            except ValidationError:
+                row_errors['email'] = 'Enter a valid email address.'
+        if len(row['username']) > 150:
+            row_errors['username'] = 'Ensure this field has no more than 150 characters.'
+        if len(row['phone_number']) > 20:
+            row_errors['phone_number'] = 'Ensure this field has no more than 20 characters.'
+        for column, values in seen.items():
+            value = row[column]
+            if value and column not in row_errors:
+                if value in values:
+                    row_errors[column] = f'Duplicate of row {values[value]} in this file.'
+                else:
+                    values[value] = number
+        if row_errors:
+            errors[number] = row_errors
+
+    # ثلاث استعلامات للدفعة كاملة بدلاً من أربع استعلامات لكل موظف
+    taken = {
+        'username': set(User.objects.filter(username__in=list(seen['username'])).values_list('username', flat=True)),
+        'email': set(User.objects.filter(email__in=list(seen['email'])).values_list('email', flat=True)),
+        'phone_number': set(
+            Employee.objects.filter(phone_number__in=list(seen['phone_number'])).values_list('phone_number', flat=True)
+        ),
+    }
+    messages = {
+        'username': 'A user with this username already exists.',
+        'email': 'A user with this email already exists.',
+        'phone_number': 'An employee with this phone number already exists.',
+    }
+    for number, row in enumerate(rows, start=2):
+        for column, values in taken.items():
+            if row[column] and row[column] in values:
+                errors.setdefault(number, {}).setdefault(column, messages[column])
+    return errors
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hash the passwords with the configured hasher, in this process by default.
+    With workers > 1 they are spread over a process pool: PBKDF2 is CPU bound and holds
+    the GIL, so threads would not help. Only the management command asks for a pool,
+    request handlers must never fork one.
+    """
+    workers = min(workers or 1, len(passwords) // MIN_ROWS_PER_HASH_WORKER)
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+def _create_chunk(company, rows, approve, processed_by):
+    users = [
+        User(
+            username=row['username'],
+            email=row['email'],
+            password=row['hashed_password'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+        )
+        for row in rows
+    ]
+    User.objects.bulk_create(users)
+    # MySQL does not return the primary keys of bulk inserted rows
+    users = User.objects.in_bulk([user.username for user in users], field_name='username')
+
+    employees = []
+    for row in rows:
+        employee = Employee(
+            user=users[row['username']],
+            company=company if approve else None,
+            phone_number=row['phone_number'] or None,
+        )
+        employee.search_document = build_search_document(employee)
+        employees.append(employee)
+    Employee.objects.bulk_create(employees)
+    employees = list(Employee.objects.select_related('user').filter(user__in=list(users.values())))
+
+    EmploymentRequest.objects.bulk_create([
+        EmploymentRequest(
+            employee=employee,
+            company=company,
+            submitted_code='',
+            status='approved' if approve else 'pending',
+            processed_by=processed_by if approve else None,
+        )
+        for employee in employees
+    ])
+    index_employees(employees, update_documents=False)
+    return len(employees)
+
+
+def import_employees(company, rows, approve=False, processed_by=None, workers=1, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Create the employees of a CSV batch for a company with set-based validation and bulk inserts.
+    With approve=True the employees join the company directly, otherwise a pending request is opened for each.
+    Return {'created', 'failed', 'errors'} where errors lists {'row', 'errors'} for every skipped row.
+    """
+    errors = _validate_rows(rows)
+    valid = [
+        (number, row) for number, row in enumerate(rows, start=2)
+        if number not in errors
+    ]
+    hashed = hash_passwords([row['password'] for _, row in valid], workers=workers)
+    for (_, row), password in zip(valid, hashed):
+        row['hashed_password'] = password
+
+    created = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                created += _create_chunk(company, [row for _, row in chunk], approve, processed_by)
+        except IntegrityError:
+            # تسجيل متزامن أخذ اسم مستخدم أو بريد أو رقم هاتف بعد التحقق
+            for number, _ in chunk:
+                errors[number] = {'detail': 'Conflicted with a concurrent registration, please import this row again.'}
+
+    return {
+        'created': created,
+        'failed': len(errors),
+        'errors': [{'row': number, 'errors': errors[number]} for number in sorted(errors)],
+    }
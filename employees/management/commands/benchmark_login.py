@@ -0,0 +1,66 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from employees.models import Employee
+from ramcompany.serializers import UnifiedTokenObtainPairSerializer
+
+
+def _login(username, password):
+    serializer = UnifiedTokenObtainPairSerializer(data={'username': username, 'password': password})
+    if not serializer.is_valid():
+        raise CommandError(f"Login failed: {serializer.errors}")
+
+
+def _worker(username, password, iterations):
+    try:
+        for _ in range(iterations):
+            _login(username, password)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Measure the unified login path: queries per login and logins per second per worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Logins per worker")
+        parser.add_argument('--workers', type=int, default=1, help="Threads logging in at the same time")
+        parser.add_argument('--username', help="Existing account to log in with (default: a temporary employee)")
+        parser.add_argument('--password')
+
+    def handle(self, *args, **options):
+        username, password = options['username'], options['password']
+        temporary = None
+        if not username:
+            username, password = f"benchmark-{uuid.uuid4().hex[:12]}", uuid.uuid4().hex
+            temporary = User.objects.create_user(username, password=password)
+            Employee.objects.create(user=temporary)
+        elif not password:
+            raise CommandError("--password is required with --username.")
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                _login(username, password)
+            self.stdout.write(f"Queries per login: {len(queries)}")
+
+            workers, iterations = options['workers'], options['iterations']
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_worker, username, password, iterations) for _ in range(workers)]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            if temporary is not None:
+                temporary.delete()
+
+        total = workers * iterations
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} logins in {elapsed:.2f}s with {workers} workers: "
+            f"{total / elapsed:.1f} logins/sec, {total / elapsed / workers:.1f} logins/sec per worker."
+        ))
@@ -0,0 +1,52 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from employees.imports import IMPORT_CHUNK_SIZE, import_employees, read_employee_csv
+
+
+class Command(BaseCommand):
+    help = "Create the employees of a company from a CSV file (username, email, password, first_name, last_name, phone_number)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, help="Company id")
+        parser.add_argument('csv_path')
+        parser.add_argument('--approve', action='store_true', help="Add the employees to the company without a pending request")
+        parser.add_argument('--processed-by', help="Username recorded as the approver of the requests")
+        parser.add_argument('--workers', type=int, help="Processes used to hash the passwords (default: CPU count)")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.select_related('owner').get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} does not exist.")
+        processed_by = company.owner
+        if options['processed_by']:
+            try:
+                processed_by = User.objects.get(username=options['processed_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['processed_by']} does not exist.")
+
+        try:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as file:
+                rows = read_employee_csv(file)
+        except ValidationError as error:
+            raise CommandError(error.messages[0])
+
+        report = import_employees(
+            company,
+            rows,
+            approve=options['approve'],
+            processed_by=processed_by,
+            workers=options['workers'] or os.cpu_count() or 1,
+            chunk_size=options['chunk_size'],
+        )
+        for error in report['errors']:
+            details = '; '.join(f"{field}: {message}" for field, message in error['errors'].items())
+            self.stderr.write(f"Row {error['row']}: {details}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} employees into {company.name}, {report['failed']} rows failed."
+        ))
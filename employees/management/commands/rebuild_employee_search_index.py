@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from employees.models import Employee
+from employees.search import index_employees
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search document and the prefix tokens of employees"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Only rebuild the employees of this company id")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.select_related('user').order_by('pk')
+        if options['company']:
+            employees = employees.filter(company_id=options['company'])
+
+        chunk_size = options['chunk_size']
+        indexed = 0
+        last_pk = 0
+        while True:
+            chunk = list(employees.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            index_employees(chunk)
+            indexed += len(chunk)
+
+        if indexed > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully indexed {indexed} employees."))
+        else:
+            self.stdout.write("No employees to index.")
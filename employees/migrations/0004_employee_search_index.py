@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:57
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of ramcompany.search.tokenize as it was when this migration was written,
+# so later changes to the tokenizer do not change what this migration does.
+MAX_TOKEN_LENGTH = 64
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+def tokenize(*parts):
+    tokens = []
+    for part in parts:
+        for token in normalize(part).split():
+            token = token[:MAX_TOKEN_LENGTH]
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def build_search_index(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    EmployeeSearchToken = apps.get_model('employees', 'EmployeeSearchToken')
+    last_pk = 0
+    while True:
+        employees = list(Employee.objects.select_related('user').filter(pk__gt=last_pk).order_by('pk')[:500])
+        if not employees:
+            break
+        tokens = []
+        for employee in employees:
+            words = tokenize(employee.user.username, employee.user.first_name, employee.user.last_name, str(employee.phone_number or ''))
+            employee.search_document = ' '.join(words)[:512]
+            tokens.extend(EmployeeSearchToken(employee_id=employee.pk, token=word) for word in words)
+        Employee.objects.bulk_update(employees, ['search_document'])
+        EmployeeSearchToken.objects.bulk_create(tokens, batch_size=1000)
+        last_pk = employees[-1].pk
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX employees_employee_search_ft ON employees_employee (search_document)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX employees_employee_search_ft ON employees_employee')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_remove_employee_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='search_document',
+            field=models.CharField(blank=True, default='', max_length=512),
+        ),
+        migrations.CreateModel(
+            name='EmployeeSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='employees.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'employee'], name='employees_e_token_107637_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_alter_company_email'),
+        ('employees', '0004_employee_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employmentrequest',
+            index=models.Index(fields=['company', 'status', 'created_at'], name='employees_e_company_b17fcb_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from companies.models import Company
+from ramcompany.dirty_fields import DirtyFieldsMixin
 
-class Employee(models.Model):
+class Employee(DirtyFieldsMixin, models.Model):
     user = models.OneToOneField(User, related_name="employee_profile", on_delete=models.CASCADE)
     
     # --- هذا هو التعديل الرئيسي ---
@@ -11,10 +14,35 @@ class Employee(models.Model):
     
     phone_number = models.CharField(max_length=20, unique=True, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # نص البحث بعد التوحيد (اسم المستخدم، الاسم، الكنية، الهاتف) - يتم بناؤه في save
+    search_document = models.CharField(max_length=512, blank=True, default='')
+
+    def save(self, *args, **kwargs):
+        from .search import build_search_document, index_employees
+        self.search_document = build_search_document(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'search_document'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if 'search_document' in self.saved_changes:
+                index_employees([self], update_documents=False)
 
     def __str__(self):
         return self.user.username
 
+
+class EmployeeSearchToken(models.Model):
+    """
+    كلمة واحدة من نص البحث لكل صف، حتى يستخدم البحث بالبادئة (LIKE 'abc%') الفهرس.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'employee']),
+        ]
+
 class EmploymentRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -28,8 +56,37 @@ class EmploymentRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='processed_requests')
 
+    class Meta:
+        indexes = [
+            # طابور الطلبات المعلقة لكل شركة مرتب حسب الأقدم
+            models.Index(fields=['company', 'status', 'created_at']),
+        ]
+
     def __str__(self):
         return f"Request from {self.employee.user.username} for {self.company.name}"
 
     
 
+
+# الحقول التي يبنى منها نص البحث في جدول المستخدم
+USER_SEARCH_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User, dispatch_uid='employees-reindex-user')
+def reindex_employee_of_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Rebuild the search document of the employee of a user whose name changed,
+    whatever path saved the user (admin, update_self, ...).
+    """
+    from .search import build_search_document, index_employees
+    if raw or (update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    try:
+        employee = instance.employee_profile
+    except Employee.DoesNotExist:
+        return
+    employee.user = instance
+    if build_search_document(employee) == employee.search_document:
+        return
+    index_employees([employee])
+    employee._take_snapshot(['search_document'])
@@ -1,16 +1,21 @@
 from rest_framework.permissions import BasePermission
+from ramcompany.principal import get_principal
 
 
 class IsSelfOrCompanyOrAdmin(BasePermission):
     def has_object_permission(self , request  , view , obj):
-        if request.user.is_staff:
+        principal = get_principal(request)
+        if not principal.is_authenticated:
+            return False
+        if principal.is_staff:
             return True
-        if request.user == obj.user:
+        if obj.user_id == principal.user_id:
             return True
-        if  obj.company and request.user == obj.company.owner :
+        if principal.owns_company(obj.company_id):
             return True
         return False
 
 class IsCompanyOwner(BasePermission):
     def has_permission(self , request ,view):
-        return request.user.is_authenticated and hasattr(request.user, 'company_profile')
\ No newline at end of file
+        principal = get_principal(request)
+        return principal.is_authenticated and principal.is_company_owner
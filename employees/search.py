@@ -0,0 +1,57 @@
+from ramcompany.search import fulltext_ranked, query_tokens, token_ranked, tokenize, use_fulltext
+from .models import Employee, EmployeeSearchToken
+
+TOKEN_BATCH_SIZE = 1000
+
+
+def employee_tokens(employee):
+    user = employee.user
+    return tokenize(user.username, user.first_name, user.last_name, employee.phone_number)
+
+
+def build_search_document(employee):
+    return ' '.join(employee_tokens(employee))[:512]
+
+
+def index_employees(employees, update_documents=True):
+    """
+    Rebuild the search document and the prefix tokens of many employees with set-based writes.
+    The employees must have their user loaded (select_related('user')) to avoid one query each.
+    """
+    employees = list(employees)
+    if not employees:
+        return
+    if update_documents:
+        for employee in employees:
+            employee.search_document = build_search_document(employee)
+        Employee.objects.bulk_update(employees, ['search_document'], batch_size=TOKEN_BATCH_SIZE)
+    EmployeeSearchToken.objects.filter(employee__in=[employee.pk for employee in employees]).delete()
+    EmployeeSearchToken.objects.bulk_create(
+        [
+            EmployeeSearchToken(employee_id=employee.pk, token=token)
+            for employee in employees
+            for token in employee_tokens(employee)
+        ],
+        batch_size=TOKEN_BATCH_SIZE
+    )
+
+
+def search_employee_ids(query, company=None):
+    """
+    Return a values queryset of {'employee_id', 'rank'} ordered by relevance.
+    Every query token must match the start of a word of the employee.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+
+    if use_fulltext(tokens):
+        employees = Employee.objects.all()
+        if company is not None:
+            employees = employees.filter(company=company)
+        return fulltext_ranked(employees, tokens, 'employee_id')
+
+    matches = EmployeeSearchToken.objects.all()
+    if company is not None:
+        matches = matches.filter(employee__company=company)
+    return token_ranked(matches, tokens, 'employee_id')
@@ -2,8 +2,11 @@ from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import Employee, EmploymentRequest
 from companies.models import Company
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from ramcompany.last_login import record_login
+from ramcompany.serializers import SparseFieldsMixin
+from ramcompany.uniqueness import find_existing
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,7 +25,7 @@ class EmployeeTokenObtainPairSerializer(TokenObtainPairSerializer):
             raise serializers.ValidationError(
                 {"detail": "This login is for employees only."}
             )
-
+        record_login(self.user)
         return data
 
 
@@ -38,23 +41,39 @@ class EmployeeSignUpSerializer(serializers.Serializer):
     first_name = serializers.CharField(required=False, allow_blank=True)
     last_name = serializers.CharField(required=False, allow_blank=True)
     
+    def uniqueness_errors(self, data):
+        """
+        Check the username, the email and the company of the signup in one query.
+        """
+        checks = {}
+        if data.get('username'):
+            checks['username'] = User.objects.filter(username=data['username'])
+        if data.get('email'):
+            checks['email'] = User.objects.filter(email=data['email'])
+        if data.get('company'):
+            checks['company'] = Company.objects.filter(pk=data['company'])
+        found = find_existing(checks)
+        errors = {}
+        if 'username' in found:
+            errors['username'] = 'A user with this username already exists.'
+        if 'email' in found:
+            errors['email'] = 'A user with this email already exists.'
+        if 'company' in checks and 'company' not in found:
+            errors['company'] = 'No company found with the provided ID.'
+        return errors
+
     def validate(self, data):
         errors = {}
         if not data.get('username'):
             errors['username'] = 'This field may not be blank.'
-        elif User.objects.filter(username=data['username']).exists():
-            errors['username'] = 'A user with this username already exists.'
         if not data.get('email'):
             errors['email'] = 'This field may not be blank.'
-        elif User.objects.filter(email=data['email']).exists():
-            errors['email'] = 'A user with this email already exists.'
         if not data.get('password'):
             errors['password'] = 'This field may not be blank.'
-        company_id = data.get('company')
-        if not company_id:
+        if not data.get('company'):
             errors['company'] = 'Company ID is required.'
-        elif not Company.objects.filter(pk=company_id).exists():
-            errors['company'] = 'No company found with the provided ID.'
+        for field, message in self.uniqueness_errors(data).items():
+            errors.setdefault(field, message)
 
         if errors:
             raise serializers.ValidationError(errors)
@@ -62,35 +81,39 @@ class EmployeeSignUpSerializer(serializers.Serializer):
         return data
 
     def create(self, validated_data):
-        with transaction.atomic():
-            user_data = {
-                'username': validated_data['username'],
-                'password': validated_data['password'],
-                'email': validated_data['email'],
-                'first_name': validated_data.get('first_name', ''),
-                'last_name': validated_data.get('last_name', '')
-            }
-            
-            user = User.objects.create_user(**user_data)            
-            employee = Employee.objects.create(user=user)
-            company_id = validated_data['company']
-            company = Company.objects.get(pk=company_id)
-            EmploymentRequest.objects.create(
-                employee=employee,
-                company=company,
-                submitted_code=validated_data.get('submitted_code', ''),
-                status='pending'
-            )
-            
-            return validated_data
-
-class EmployeeSerializer(serializers.ModelSerializer):
+        try:
+            with transaction.atomic():
+                user_data = {
+                    'username': validated_data['username'],
+                    'password': validated_data['password'],
+                    'email': validated_data['email'],
+                    'first_name': validated_data.get('first_name', ''),
+                    'last_name': validated_data.get('last_name', '')
+                }
+
+                user = User.objects.create_user(**user_data)
+                employee = Employee.objects.create(user=user)
+                EmploymentRequest.objects.create(
+                    employee=employee,
+                    company_id=validated_data['company'],
+                    submitted_code=validated_data.get('submitted_code', ''),
+                    status='pending'
+                )
+        except IntegrityError:
+            # سباق مع تسجيل آخر أو شركة حُذفت: القيود في قاعدة البيانات رفضت الإدخال
+            errors = self.uniqueness_errors(validated_data)
+            raise serializers.ValidationError(errors or {'detail': 'This account could not be created, please try again.'})
+
+        return validated_data
+
+class EmployeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     company_name = serializers.CharField(source='company.name', read_only=True)
     employee_id = serializers.IntegerField(source='id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
     class Meta:
         model = Employee
-        fields = ['employee_id', 'user_details', 'company_name', 'phone_number', 'is_active']
+        fields = ['employee_id', 'username', 'user_details', 'company_name', 'phone_number', 'is_active']
 
  
 
@@ -160,3 +183,13 @@ class EmploymentRequestSerializer(serializers.ModelSerializer):
         model = EmploymentRequest
         fields = ['request_id', 'employee_details', 'company_name', 'submitted_code', 
                   'status', 'created_at', 'processed_by_username']
+
+
+class EmployeeImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    approve = serializers.BooleanField(default=False)
+
+
+class BulkEmploymentRequestSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
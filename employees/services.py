@@ -0,0 +1,57 @@
+from django.db import transaction
+
+from .models import Employee, EmploymentRequest
+
+REQUEST_ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+
+
+def process_employment_requests(company, request_ids, action, processed_by):
+    """
+    Approve or reject many pending employment requests of a company with set-based UPDATEs.
+    The requests (and, when approving, their employees) are locked so a request is never processed twice.
+    Return {request_id: outcome} where outcome is the new status, 'not_found',
+    'already_processed' or 'already_employed'.
+    """
+    new_status = REQUEST_ACTIONS[action]
+    request_ids = list(dict.fromkeys(request_ids))
+    outcomes = {request_id: 'not_found' for request_id in request_ids}
+
+    with transaction.atomic():
+        rows = list(
+            EmploymentRequest.objects.select_for_update()
+            .filter(pk__in=request_ids, company=company)
+            .order_by('pk')
+            .values_list('pk', 'employee_id', 'status')
+        )
+        pending = []
+        for pk, employee_id, current_status in rows:
+            if current_status != 'pending':
+                outcomes[pk] = 'already_processed'
+            else:
+                pending.append((pk, employee_id))
+
+        if action == 'approve':
+            available = set(
+                Employee.objects.select_for_update()
+                .filter(pk__in=[employee_id for _, employee_id in pending], company__isnull=True)
+                .values_list('pk', flat=True)
+            )
+            accepted = []
+            for pk, employee_id in pending:
+                # الموظف الذي قُبل في طلب سابق (أو في نفس الدفعة) لا يمكن قبوله مرة أخرى
+                if employee_id in available:
+                    available.discard(employee_id)
+                    accepted.append((pk, employee_id))
+                else:
+                    outcomes[pk] = 'already_employed'
+            pending = accepted
+            Employee.objects.filter(pk__in=[employee_id for _, employee_id in pending]).update(company=company)
+
+        EmploymentRequest.objects.filter(pk__in=[pk for pk, _ in pending]).update(
+            status=new_status,
+            processed_by=processed_by
+        )
+        for pk, _ in pending:
+            outcomes[pk] = new_status
+
+    return outcomes
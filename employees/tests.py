@@ -1,3 +1,267 @@
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from ramcompany.principal import get_principal, resolve_principal
+from .imports import MAX_IMPORT_ROWS
+from .models import Employee, EmployeeSearchToken, EmploymentRequest
+
+
+def create_company(username='owner', phone_number='+963944000001'):
+    return Company.objects.create(
+        owner=User.objects.create_user(username, password='owner-pass'),
+        name=f'{username} company',
+        phone_number=phone_number
+    )
+
+
+def create_employee(username, company=None, **user_fields):
+    user = User.objects.create_user(username, password='employee-pass', **user_fields)
+    return Employee.objects.create(user=user, company=company)
+
+
+class EmployeeSearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company()
+        self.employee = create_employee('sami', self.company, first_name='Sami', last_name='Haddad')
+        self.client = APIClient()
+        self.client.force_authenticate(self.company.owner)
+
+    def search(self, name):
+        response = self.client.get('/employee/get/name/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [row['username'] for row in response.data['results']]
+
+    def test_search_matches_name_prefixes(self):
+        self.assertEqual(self.search('hadd'), ['sami'])
+        self.assertEqual(self.search('sam had'), ['sami'])
+        self.assertEqual(self.search('zaid'), [])
+
+    def test_renaming_the_user_reindexes_the_employee(self):
+        user = User.objects.get(pk=self.employee.user_id)
+        user.first_name = 'Zaid'
+        user.save()
+
+        self.assertEqual(self.search('zaid'), ['sami'])
+        self.assertEqual(self.search('sami haddad'), ['sami'])
+        self.employee.refresh_from_db()
+        self.assertIn('zaid', self.employee.search_document.split())
+        self.assertEqual(EmployeeSearchToken.objects.filter(employee=self.employee, token='sami').count(), 1)
+
+    def test_saving_a_user_without_employee_profile_is_ignored(self):
+        owner = self.company.owner
+        owner.first_name = 'Owner'
+        owner.save()
+        self.assertEqual(EmployeeSearchToken.objects.exclude(employee=self.employee).count(), 0)
+
+    def test_unrelated_user_saves_do_not_rewrite_tokens(self):
+        tokens = list(EmployeeSearchToken.objects.filter(employee=self.employee).values_list('pk', flat=True))
+        user = User.objects.get(pk=self.employee.user_id)
+        user.email = 'sami@example.com'
+        user.save()
+        self.assertEqual(list(EmployeeSearchToken.objects.filter(employee=self.employee).values_list('pk', flat=True)), tokens)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmployeeImportTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company()
+        create_employee('taken', email='taken@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.company.owner)
+
+    def upload(self, lines, approve=False):
+        content = '\n'.join(['username,email,password,first_name,last_name,phone_number', *lines])
+        csv_file = SimpleUploadedFile('employees.csv', content.encode('utf-8'), content_type='text/csv')
+        return self.client.post('/employee/import/', {'file': csv_file, 'approve': approve}, format='multipart')
+
+    def test_import_reports_the_rows_it_skipped(self):
+        response = self.upload([
+            'rami,rami@example.com,pass-1234,Rami,Saad,+963955000001',
+            'taken,new@example.com,pass-1234,,,',
+            'lina,not-an-email,pass-1234,,,',
+            'rami,other@example.com,pass-1234,,,',
+            'nour,nour@example.com,,,,',
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 4))
+        self.assertEqual(
+            [(error['row'], sorted(error['errors'])) for error in response.data['errors']],
+            [(3, ['username']), (4, ['email']), (5, ['username']), (6, ['password'])]
+        )
+        employee = Employee.objects.select_related('user').get(user__username='rami')
+        self.assertIsNone(employee.company)
+        self.assertTrue(employee.user.check_password('pass-1234'))
+        self.assertEqual(EmploymentRequest.objects.get(employee=employee).status, 'pending')
+        self.assertTrue(EmployeeSearchToken.objects.filter(employee=employee, token='saad').exists())
+
+    def test_approved_import_joins_the_company(self):
+        response = self.upload(['rami,rami@example.com,pass-1234,,,'], approve=True)
+        self.assertEqual(response.status_code, 201)
+        request = EmploymentRequest.objects.select_related('employee').get(employee__user__username='rami')
+        self.assertEqual((request.status, request.processed_by), ('approved', self.company.owner))
+        self.assertEqual(request.employee.company, self.company)
+
+    def test_file_without_valid_rows_is_rejected(self):
+        response = self.upload(['taken,taken@example.com,pass-1234,,,'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+
+    def test_file_over_the_row_limit_is_rejected(self):
+        lines = [f'user{index},user{index}@example.com,pass-1234,,,' for index in range(MAX_IMPORT_ROWS + 1)]
+        response = self.upload(lines)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Employee.objects.filter(user__username='user0').exists())
+
+    def test_missing_required_column_is_rejected(self):
+        csv_file = SimpleUploadedFile('employees.csv', b'username,password\nrami,pass-1234', content_type='text/csv')
+        response = self.client.post('/employee/import/', {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data['detail'])
+
+
+class BulkEmploymentRequestTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company()
+        self.other_company = create_company('other-owner', '+963944000002')
+        self.client = APIClient()
+        self.client.force_authenticate(self.company.owner)
+
+    def request_for(self, username, company=None, status='pending'):
+        employee = Employee.objects.filter(user__username=username).first() or create_employee(username)
+        return EmploymentRequest.objects.create(employee=employee, company=company or self.company, status=status)
+
+    def process(self, ids, action):
+        response = self.client.post('/employee/request/bulk/', {'ids': ids, 'action': action}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['processed'], {row['id']: row['outcome'] for row in response.data['results']}
+
+    def test_approve_reports_an_outcome_for_every_id(self):
+        pending = self.request_for('rami')
+        done = self.request_for('lina', status='rejected')
+        foreign = self.request_for('nour', company=self.other_company)
+
+        processed, outcomes = self.process([pending.pk, done.pk, foreign.pk, 999999], 'approve')
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(outcomes, {
+            pending.pk: 'approved',
+            done.pk: 'already_processed',
+            foreign.pk: 'not_found',
+            999999: 'not_found',
+        })
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.processed_by), ('approved', self.company.owner))
+        self.assertEqual(pending.employee.company, self.company)
+        self.assertEqual(EmploymentRequest.objects.get(pk=foreign.pk).status, 'pending')
+
+    def test_an_employee_is_approved_once(self):
+        first = self.request_for('rami')
+        second = self.request_for('rami')
+        employed = self.request_for('lina')
+        Employee.objects.filter(pk=employed.employee_id).update(company=self.other_company)
+
+        processed, outcomes = self.process([first.pk, second.pk, employed.pk], 'approve')
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(outcomes, {first.pk: 'approved', second.pk: 'already_employed', employed.pk: 'already_employed'})
+        self.assertEqual(Employee.objects.get(pk=employed.employee_id).company, self.other_company)
+
+    def test_reject_leaves_the_employee_free(self):
+        pending = self.request_for('rami')
+        processed, outcomes = self.process([pending.pk, pending.pk], 'reject')
+        self.assertEqual((processed, outcomes), (1, {pending.pk: 'rejected'}))
+        self.assertIsNone(Employee.objects.get(pk=pending.employee_id).company)
+
+    def test_employee_can_not_process_requests(self):
+        pending = self.request_for('rami')
+        self.client.force_authenticate(pending.employee.user)
+        response = self.client.post('/employee/request/bulk/', {'ids': [pending.pk], 'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(EmploymentRequest.objects.get(pk=pending.pk).status, 'pending')
+
+
+class PrincipalTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company()
+        self.employee = create_employee('sami', self.company)
+
+    def test_profiles_are_resolved_with_one_query(self):
+        owner = User.objects.get(pk=self.company.owner_id)
+        with self.assertNumQueries(1):
+            principal = resolve_principal(owner)
+        self.assertEqual((principal.company_id, principal.employee_id), (self.company.pk, None))
+        self.assertTrue(principal.is_company_owner)
+        self.assertTrue(principal.owns_company(self.company.pk))
+        self.assertFalse(principal.owns_company(None))
+
+        employee_user = User.objects.select_related('company_profile', 'employee_profile').get(pk=self.employee.user_id)
+        with self.assertNumQueries(0):
+            principal = resolve_principal(employee_user)
+        self.assertEqual((principal.company_id, principal.employee_id), (None, self.employee.pk))
+
+    def test_anonymous_user_has_no_profiles(self):
+        with self.assertNumQueries(0):
+            principal = resolve_principal(AnonymousUser())
+        self.assertFalse(principal.is_authenticated)
+        self.assertFalse(principal.is_company_owner or principal.is_employee)
+
+    def test_principal_is_resolved_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=self.company.owner_id)
+        principal = get_principal(request)
+        with self.assertNumQueries(0):
+            self.assertIs(get_principal(request), principal)
+
+        request.user = User.objects.get(pk=self.employee.user_id)
+        self.assertEqual(get_principal(request).employee_id, self.employee.pk)
+
+
+class UpdateEmployeeTests(TestCase):
+
+    def setUp(self):
+        self.company = create_company()
+        self.employee = create_employee('sami', self.company, first_name='Sami', last_name='Haddad')
+        self.client = APIClient()
+        self.client.force_authenticate(self.company.owner)
+
+    def search(self, name):
+        response = self.client.get('/employee/get/name/', {'name': name})
+        return [row['username'] for row in response.data['results']]
+
+    def update(self, user, data):
+        self.client.force_authenticate(user)
+        return self.client.patch(f'/employee/{self.employee.pk}/update/', data, format='json')
+
+    def test_owner_of_another_company_is_forbidden(self):
+        other = create_company('other-owner', '+963944000002')
+        response = self.update(other.owner, {'phone_number': '+963955000009'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNone(Employee.objects.get(pk=self.employee.pk).phone_number)
+
+    def test_another_employee_is_forbidden(self):
+        colleague = create_employee('lina', self.company)
+        self.assertEqual(self.update(colleague.user, {'first_name': 'Lina'}).status_code, 403)
+
+    def test_employee_can_update_themselves(self):
+        response = self.update(self.employee.user, {'phone_number': '+963955000009'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Employee.objects.get(pk=self.employee.pk).phone_number, '+963955000009')
+
+    def test_unknown_employee_is_not_found(self):
+        self.client.force_authenticate(self.company.owner)
+        self.assertEqual(self.client.patch('/employee/999999/update/', {}, format='json').status_code, 404)
+
+    def test_update_endpoint_reindexes_the_employee(self):
+        response = self.update(self.company.owner, {'last_name': 'Khoury'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('khoury'), ['sami'])
+        self.assertEqual(self.search('haddad'), [])
 
-# Create your tests here.
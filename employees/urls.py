@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('register/' , views.register_employee , name = 'sign-up-user'),
+    path('import/' , views.import_employees_csv , name = 'import-employees'),
     path('<int:employee_id>/get/' , views.get_employee_by_id , name = 'get-by-id'),
     path('getall/' , views.get_all_employees , name = 'get-all-employees'),
     path('<int:employee_id>/update/' , views.update_employee , name = 'edit-employee'),
@@ -13,6 +14,7 @@ urlpatterns = [
     path('request/pending/' , views.list_pending_requests , name = 'pending-requests'),
     path('request/<int:pk>/accept/' , views.accept_employment_request , name = 'accept-request'),
     path('request/<int:pk>/reject/' , views.reject_employment_request , name = 'reject-request'),
+    path('request/bulk/' , views.bulk_process_employment_requests , name = 'bulk-process-requests'),
     path('request/creat/' ,  views.create_employment_request , name = "only-request-company"),
     path('request/cancel/', views.cancel_my_employment_request, name='cancel-my-request'),
 ]
\ No newline at end of file
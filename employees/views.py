@@ -1,15 +1,24 @@
 from django.shortcuts import render
-from rest_framework.decorators import api_view , permission_classes
+from rest_framework.decorators import api_view , permission_classes , throttle_classes
 from rest_framework.permissions import AllowAny , IsAdminUser , IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import ChangePasswordSerializer,EmployeeSignUpSerializer, EmploymentRequestSerializer,EmployeeSerializer,OnlyEmploymentRequestSerializer ,EmployeeTokenObtainPairSerializer 
+from .serializers import ChangePasswordSerializer,EmployeeSignUpSerializer, EmploymentRequestSerializer,EmployeeSerializer,OnlyEmploymentRequestSerializer ,EmployeeTokenObtainPairSerializer , EmployeeImportSerializer , BulkEmploymentRequestSerializer , EmployeeUpdateSerializer
 from .models import Employee , EmploymentRequest
 from .permissions import IsSelfOrCompanyOrAdmin , IsCompanyOwner
 from companies.models import Company
+from ramcompany.pagination import KeysetPagination, StandardCursorPagination, StandardPageNumberPagination
+from ramcompany.serializers import requested_fields
+from ramcompany.principal import get_principal
+from .search import search_employee_ids
+from .services import process_employment_requests
+from .imports import MAX_IMPORT_ROWS, import_employees, read_employee_csv
+from django.core.exceptions import ValidationError
+from ramcompany.throttling import LOGIN_THROTTLES, PasswordChangeRateThrottle, RegisterRateThrottle
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterRateThrottle])
 def register_employee(request):
     serializer = EmployeeSignUpSerializer(data = request.data)
     if serializer.is_valid():
@@ -17,10 +26,40 @@ def register_employee(request):
         return Response(serializer.data , status = status.HTTP_201_CREATED)
     return Response(serializer.errors , status = status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+def import_employees_csv(request):
+    """
+    Create many employees of the owner's company from an uploaded CSV file.
+    Columns: username, email, password, first_name, last_name, phone_number.
+    approve=true adds them to the company directly, otherwise a pending request is opened for each.
+    """
+    serializer = EmployeeImportSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        rows = read_employee_csv(serializer.validated_data['file'])
+    except (ValidationError, UnicodeDecodeError) as error:
+        detail = error.messages[0] if isinstance(error, ValidationError) else 'The file must be UTF-8 encoded CSV.'
+        return Response({'detail': detail}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > MAX_IMPORT_ROWS:
+        return Response(
+            {'detail': f'A file may contain at most {MAX_IMPORT_ROWS} rows, larger files are imported with the import_employees command.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    report = import_employees(
+        get_principal(request).company,
+        rows,
+        approve=serializer.validated_data['approve'],
+        processed_by=request.user,
+    )
+    response_status = status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+    return Response(report, status=response_status)
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def employee_login(request):
-    serializer = EmployeeTokenObtainPairSerializer(data=request.data)
+    serializer = EmployeeTokenObtainPairSerializer(data=request.data, context={'request': request})
     serializer.is_valid(raise_exception=True)
     return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
@@ -29,15 +68,17 @@ def employee_login(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, (IsAdminUser | IsCompanyOwner)])
 def get_all_employees(request):
-    if request.user.is_staff:
+    principal = get_principal(request)
+    if principal.is_staff:
         employees = Employee.objects.filter(company__isnull=False)
-    elif hasattr(request.user, 'company_profile'):
-        company = request.user.company_profile
-        employees = Employee.objects.filter(company=company)
+    elif principal.is_company_owner:
+        employees = Employee.objects.filter(company=principal.company)
     else:
         employees = Employee.objects.none()
-    serializer = EmployeeSerializer(employees, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    paginator = StandardCursorPagination()
+    page = paginator.paginate_queryset(employees.select_related('user', 'company'), request)
+    serializer = EmployeeSerializer(page, many=True, fields=requested_fields(request.query_params))
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
@@ -55,10 +96,18 @@ def get_employee_by_id(request , employee_id):
 @permission_classes([IsCompanyOwner | IsAdminUser])
 def get_employee_by_name(request):
     name_query = request.query_params.get('name' , '')
-    company = request.user.company_profile
-    employees = Employee.objects.filter(company = company , user__username__icontains = name_query)
-    serializer = EmployeeSerializer(employees , many = True)
-    return Response(serializer.data , status = status.HTTP_200_OK)
+    company = get_principal(request).company
+    paginator = StandardPageNumberPagination()
+    ranked = search_employee_ids(name_query , company = company)
+    if ranked is None:
+        employees = Employee.objects.filter(company = company) if company else Employee.objects.filter(company__isnull = False)
+        page = paginator.paginate_queryset(employees.select_related('user' , 'company').order_by('pk') , request)
+    else:
+        rows = paginator.paginate_queryset(ranked , request)
+        found = Employee.objects.select_related('user' , 'company').in_bulk([row['employee_id'] for row in rows])
+        page = [found[row['employee_id']] for row in rows if row['employee_id'] in found]
+    serializer = EmployeeSerializer(page , many = True , fields = requested_fields(request.query_params))
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['PUT' , 'PATCH'])
 @permission_classes([IsSelfOrCompanyOrAdmin])
@@ -67,6 +116,7 @@ def update_employee(request , employee_id):
         employee = Employee.objects.get(pk = employee_id)
     except Employee.DoesNotExist:
         return Response({"detail" : "Employee not found"} , status = status.HTTP_404_NOT_FOUND)
+    request.parser_context['view'].check_object_permissions(request , employee)
     serializer = EmployeeUpdateSerializer(
         instance = employee, data = request.data ,
         partial = request.method == 'PATCH')
@@ -77,6 +127,7 @@ def update_employee(request , employee_id):
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([PasswordChangeRateThrottle])
 def change_password(request):
     user = request.user
     serializer = ChangePasswordSerializer(data = request.data , context = {"request" :  request })
@@ -98,23 +149,30 @@ def delete_employee(request , employee_id):
     return Response({"detail" : "Employee deleted successfully"} , status = status.HTTP_204_NO_CONTENT)
 
 
+class PendingRequestPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
 @api_view(['GET'])
 @permission_classes([IsCompanyOwner])
 def list_pending_requests (request):
-    company = request.user.company_profile
-    pending_requests = EmploymentRequest.objects.filter(company = company , status = 'pending')
-
-    serializer = EmploymentRequestSerializer(pending_requests , many = True)
-    return Response(serializer.data , status = status.HTTP_200_OK)
+    company = get_principal(request).company
+    pending_requests = EmploymentRequest.objects.filter(company = company , status = 'pending').select_related(
+        'employee__user' , 'employee__company' , 'company' , 'processed_by'
+    )
+    paginator = PendingRequestPagination()
+    page = paginator.paginate_queryset(pending_requests , request)
+    serializer = EmploymentRequestSerializer(page , many = True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsCompanyOwner])
 def accept_employment_request(request ,pk):
     try:
-        request_to_approve = EmploymentRequest.objects.get(pk=pk)
+        request_to_approve = EmploymentRequest.objects.select_related('employee__user').get(pk=pk)
     except EmploymentRequest.DoesNotExist:
         return Response({'detail': 'Request not Found'}, status=status.HTTP_404_NOT_FOUND)
-    if request.user != request_to_approve.company.owner:
+    if not get_principal(request).owns_company(request_to_approve.company_id):
         return Response({"detail": "You don't have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
     
     if request_to_approve.status != 'pending':
@@ -133,9 +191,9 @@ def accept_employment_request(request ,pk):
 def reject_employment_request(request , pk):
     try:
         reject_request = EmploymentRequest.objects.get(pk = pk )
-    except:
-        Response({"detail":"this request doesnt here anymore"})
-    if request.user != reject_request.company.owner:
+    except EmploymentRequest.DoesNotExist:
+        return Response({"detail":"this request doesnt here anymore"} , status = status.HTTP_404_NOT_FOUND)
+    if not get_principal(request).owns_company(reject_request.company_id):
         return Response({"detail":"you don't have permission to do this Reject"})
     if reject_request.status != 'pending':
         return Response({"detail" : "this Request doesnt here anymore"} , status=status.HTTP_400_BAD_REQUEST)
@@ -144,13 +202,37 @@ def reject_employment_request(request , pk):
     reject_request.save()
     return Response({"detail" : "this request has rejected"} , status = status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+def bulk_process_employment_requests(request):
+    """
+    Approve or reject a list of pending requests of the owner's company in one transaction.
+    Body: {"ids": [...], "action": "approve" | "reject"}. Every id gets its own outcome.
+    """
+    serializer = BulkEmploymentRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    action = serializer.validated_data['action']
+    outcomes = process_employment_requests(
+        get_principal(request).company,
+        serializer.validated_data['ids'],
+        action,
+        processed_by=request.user
+    )
+    processed = sum(1 for outcome in outcomes.values() if outcome in ('approved', 'rejected'))
+    return Response(
+        {
+            'processed': processed,
+            'results': [{'id': request_id, 'outcome': outcome} for request_id, outcome in outcomes.items()]
+        },
+        status=status.HTTP_200_OK
+    )
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated]) 
 def create_employment_request(request):
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
+    employee = get_principal(request).employee
+    if employee is None:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
     if employee.company is not None:
         return Response(
@@ -184,9 +266,8 @@ def create_employment_request(request):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def cancel_my_employment_request(request):
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
+    employee = get_principal(request).employee
+    if employee is None:
         return Response({"detail": "Employee profile not found."}, status=status.HTTP_404_NOT_FOUND)
     try:
         pending_request = EmploymentRequest.objects.get(employee=employee, status='pending')
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+# Responses that may change if the same request is sent again are not stored
+NOT_STORED_STATUSES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+def _lease():
+    # How long a claim without a response blocks its key, a worker that died mid-request frees it after that
+    return getattr(settings, 'IDEMPOTENCY_LEASE', timedelta(seconds=60))
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(request, scope, key, fingerprint):
+    """
+    Return (record, response). When response is set the view must not run.
+    The claim expires after the lease; _store extends it to IDEMPOTENCY_KEY_TTL with the response.
+    """
+    now = timezone.now()
+    expires_at = now + _lease()
+    record = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user,
+                    scope=scope,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=expires_at
+                )
+            return record, None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key).first()
+            if record is None:
+                return None, Response({"detail": "Could not reserve the Idempotency-Key, please retry."}, status=status.HTTP_409_CONFLICT)
+
+    if record.expires_at <= now:
+        taken = IdempotencyKey.objects.filter(pk=record.pk, expires_at__lte=now).update(
+            fingerprint=fingerprint,
+            response_status=None,
+            response_body=None,
+            created_at=now,
+            expires_at=expires_at
+        )
+        if taken:
+            record.fingerprint = fingerprint
+            record.response_status = None
+            record.created_at = now
+            return record, None
+        record.refresh_from_db()
+
+    if record.fingerprint != fingerprint:
+        return None, Response(
+            {"detail": "This Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.response_status is None:
+        return None, Response(
+            {"detail": "A request with this Idempotency-Key is still being processed."},
+            status=status.HTTP_409_CONFLICT
+        )
+    return None, _replay(record)
+
+
+def _owned(record):
+    # The claim is ours as long as no other request took it over after the lease expired
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def _store(record, response):
+    _owned(record).update(
+        response_status=response.status_code,
+        response_body=response.data,
+        expires_at=timezone.now() + settings.IDEMPOTENCY_KEY_TTL
+    )
+
+
+def idempotent(scope):
+    """
+    Make a DRF function view safe to retry with an Idempotency-Key header.
+    Place it below @permission_classes so it runs after authentication and throttling.
+    Requests without the header are not affected.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_func(request, *args, **kwargs)
+            if len(key) > 255:
+                return Response({"detail": "Idempotency-Key must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+            record, response = _claim(request, scope, key, request_fingerprint(request))
+            if response is not None:
+                return response
+
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                _owned(record).delete()
+                raise
+            if response.status_code >= 500 or response.status_code in NOT_STORED_STATUSES:
+                _owned(record).delete()
+                return response
+            _store(record, response)
+            return response
+        return wrapper
+    return decorator
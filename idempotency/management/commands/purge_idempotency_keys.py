@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from idempotency.models import IdempotencyKey
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys"
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:CHUNK_SIZE]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        if deleted > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully deleted {deleted} expired idempotency keys."))
+        else:
+            self.stdout.write("No expired idempotency keys to delete.")
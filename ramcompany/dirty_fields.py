@@ -0,0 +1,89 @@
+import copy
+
+from django.db.models.fields.files import FieldFile
+
+
+def _snapshot(value):
+    # FieldFile objects are changed in place by FieldFile.save(), keep only the stored name
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class DirtyFieldsMixin:
+    """
+    Remember the field values loaded from the database (or last saved), so save() knows what
+    changed without a SELECT and writes only those columns.
+
+    get_dirty_fields() returns {attname: old value} of the unsaved changes.
+    saved_changes holds the same mapping for the last save(), for code that runs after it.
+    A save() that changes nothing issues no query, like Model.save(update_fields=[]): no
+    pre_save/post_save signal is sent and auto_now fields keep their value. No receiver is
+    connected to the models using this mixin (companies/tests.py checks it).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+
+    def _take_snapshot(self, field_names=None):
+        loaded = self.__dict__
+        snapshot = {
+            field.attname: _snapshot(loaded[field.attname])
+            for field in self._meta.concrete_fields
+            if field.attname in loaded
+            and (field_names is None or field.name in field_names or field.attname in field_names)
+        }
+        if field_names is None or getattr(self, '_loaded_values', None) is None:
+            self._loaded_values = snapshot
+        else:
+            self._loaded_values.update(snapshot)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # The reloaded values are what the database holds now, nothing is dirty any more
+        self._take_snapshot(fields)
+
+    def get_dirty_fields(self):
+        loaded_values = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded_values is None:
+            return {field.attname: None for field in self._meta.concrete_fields}
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            current = _snapshot(self.__dict__[field.attname])
+            if field.attname not in loaded_values:
+                dirty[field.attname] = None
+            elif current != loaded_values[field.attname]:
+                dirty[field.attname] = loaded_values[field.attname]
+        return dirty
+
+    def save(self, *args, **kwargs):
+        dirty = self.get_dirty_fields()
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            if not dirty:
+                self.saved_changes = {}
+                return
+            auto_now = [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False)
+            ]
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if field.attname in dirty and not field.primary_key
+            ] + [name for name in auto_now if name not in dirty]
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            names = set(update_fields)
+            dirty = {
+                attname: value for attname, value in dirty.items()
+                if self._meta.get_field(attname).name in names
+            }
+        self.saved_changes = dirty
+        self._take_snapshot(update_fields)
@@ -0,0 +1,92 @@
+import atexit
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, When
+from django.utils import timezone
+
+FLUSH_INTERVAL = 60
+MAX_PENDING = 500
+
+_lock = threading.Lock()
+_pending = {}
+_wake = threading.Event()
+_flusher = None
+
+
+def record_login(user):
+    """
+    Store the login time of a user according to settings.LAST_LOGIN_UPDATES:
+    'off' skips it, 'immediate' writes it now, 'deferred' buffers it in this process and
+    a background thread writes the buffer in one UPDATE every FLUSH_INTERVAL seconds
+    or as soon as MAX_PENDING logins are waiting.
+    """
+    mode = getattr(settings, 'LAST_LOGIN_UPDATES', 'off')
+    if mode == 'off':
+        return
+    now = timezone.now()
+    user.last_login = now
+    if mode == 'immediate':
+        get_user_model()._default_manager.filter(pk=user.pk).update(last_login=now)
+        return
+
+    with _lock:
+        _pending[user.pk] = now
+        full = len(_pending) >= MAX_PENDING
+        _start_flusher()
+    if full:
+        _wake.set()
+
+
+def _start_flusher():
+    # Called with _lock held
+    global _flusher
+    if _flusher is None or not _flusher.is_alive():
+        _flusher = threading.Thread(target=_flush_periodically, name='last-login-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_periodically():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        close_old_connections()
+        try:
+            flush_last_logins()
+        except Exception:
+            # The batch is lost, the next logins of these users are written again
+            pass
+        finally:
+            close_old_connections()
+
+
+def write_last_logins(batch):
+    if not batch:
+        return 0
+    return get_user_model()._default_manager.filter(pk__in=list(batch)).update(
+        last_login=Case(
+            *[When(pk=user_id, then=value) for user_id, value in batch.items()],
+            output_field=DateTimeField()
+        )
+    )
+
+
+def flush_last_logins():
+    """
+    Write every buffered login time now.
+    """
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    return write_last_logins(batch)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush_last_logins()
+    except Exception:
+        # The database may already be unreachable while the worker shuts down
+        pass
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+
+from .backends import PROFILE_RELATIONS
+
+REQUEST_ATTRIBUTE = '_principal'
+
+
+class Principal:
+    """
+    The account behind a request: the user with its company and employee profiles.
+    Built once per request by get_principal; permissions and views read the profiles from here.
+    """
+    __slots__ = ('user', 'company', 'employee')
+
+    def __init__(self, user, company=None, employee=None):
+        self.user = user
+        self.company = company
+        self.employee = employee
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    @property
+    def is_staff(self):
+        return self.user.is_staff
+
+    @property
+    def user_id(self):
+        return self.user.pk
+
+    @property
+    def company_id(self):
+        return self.company.pk if self.company is not None else None
+
+    @property
+    def employee_id(self):
+        return self.employee.pk if self.employee is not None else None
+
+    @property
+    def is_company_owner(self):
+        return self.company is not None
+
+    @property
+    def is_employee(self):
+        return self.employee is not None
+
+    def owns_company(self, company_id):
+        return company_id is not None and company_id == self.company_id
+
+
+def _profiles_loaded(user):
+    UserModel = type(user)
+    return all(getattr(UserModel, relation).is_cached(user) for relation in PROFILE_RELATIONS)
+
+
+def resolve_principal(user):
+    if not user.is_authenticated:
+        return Principal(user)
+    if not _profiles_loaded(user):
+        # Users authenticated by the session (admin) or by another backend: one joined query
+        loaded = get_user_model()._default_manager.select_related(*PROFILE_RELATIONS).get(pk=user.pk)
+        for relation in PROFILE_RELATIONS:
+            getattr(type(user), relation).related.set_cached_value(
+                user, getattr(loaded, relation, None)
+            )
+    return Principal(
+        user,
+        company=getattr(user, 'company_profile', None),
+        employee=getattr(user, 'employee_profile', None),
+    )
+
+
+def get_principal(request):
+    """
+    The Principal of a DRF request, resolved on first use and kept on the underlying HttpRequest.
+    """
+    http_request = getattr(request, '_request', request)
+    principal = getattr(http_request, REQUEST_ATTRIBUTE, None)
+    if principal is None or principal.user is not request.user:
+        principal = resolve_principal(request.user)
+        setattr(http_request, REQUEST_ATTRIBUTE, principal)
+    return principal
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TOKENS = 5
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    """
+    Lower-case, strip accents and Arabic diacritics, and turn every separator into one space.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+def tokenize(*parts):
+    """
+    Distinct normalized tokens of the given strings, in order of appearance.
+    """
+    tokens = []
+    for part in parts:
+        for token in normalize(part).split():
+            token = token[:MAX_TOKEN_LENGTH]
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def query_tokens(query):
+    return tokenize(query)[:MAX_QUERY_TOKENS]
+
+
+def fulltext_boolean_query(tokens):
+    """
+    MySQL boolean-mode query where every token is required and matched as a prefix.
+    """
+    return ' '.join(f'+{token}*' for token in tokens)
+
+
+def use_fulltext(tokens):
+    # InnoDB ignores words shorter than innodb_ft_min_token_size (3 by default)
+    return (
+        connection.vendor == 'mysql'
+        and getattr(settings, 'SEARCH_FULLTEXT', True)
+        and all(len(token) >= 3 for token in tokens)
+    )
+
+
+def fulltext_ranked(queryset, tokens, id_name):
+    """
+    Rank the rows of queryset with MATCH ... AGAINST on their search_document column.
+    """
+    column = f'{queryset.model._meta.db_table}.search_document'
+    return queryset.annotate(
+        rank=RawSQL(f"MATCH ({column}) AGAINST (%s IN BOOLEAN MODE)", [fulltext_boolean_query(tokens)]),
+        **{id_name: F('pk')}
+    ).filter(rank__gt=0).values(id_name, 'rank').order_by('-rank', id_name)
+
+
+def token_ranked(token_queryset, tokens, id_name):
+    """
+    Group the rows of a search token table by owner and keep the owners where every query
+    token prefixes one of their tokens. Owners whose tokens match the words exactly rank first.
+    """
+    matches = token_queryset.filter(reduce(or_, [Q(token__startswith=token) for token in tokens]))
+    per_token = {
+        f'token_{index}': Max(Case(When(token__startswith=token, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for index, token in enumerate(tokens)
+    }
+    exact = {
+        f'exact_{index}': Max(Case(When(token=token, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for index, token in enumerate(tokens)
+    }
+    rows = matches.values(id_name).annotate(**per_token, **exact)
+    rows = rows.filter(**{name: 1 for name in per_token})
+    rank = sum((F(name) for name in exact), Value(0))
+    return rows.annotate(rank=rank).values(id_name, 'rank').order_by('-rank', id_name)
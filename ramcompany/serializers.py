@@ -1,5 +1,6 @@
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
+from .last_login import record_login
 
 
 class UnifiedTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -26,7 +27,31 @@ class UnifiedTokenObtainPairSerializer(TokenObtainPairSerializer):
                 {"detail" : "No User account type"}
             )
 
+        record_login(user)
         data['user_type'] = user_type
         data['username'] = user.username
         data['profile_id'] = profile_id
         return data
+
+
+def requested_fields(query_params, param='fields'):
+    """
+    The field names asked for with ?fields=a,b (None when the parameter is missing or empty).
+    """
+    names = [name.strip() for name in query_params.get(param, '').split(',')]
+    return [name for name in names if name] or None
+
+
+class SparseFieldsMixin:
+    """
+    Accept fields=[...] to render only a subset of the declared fields.
+    Unknown names are ignored; when none of the names are known the full representation is kept.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            keep = set(fields) & set(self.fields)
+            if keep:
+                for name in set(self.fields) - keep:
+                    self.fields.pop(name)
@@ -43,7 +43,8 @@ INSTALLED_APPS = [
     'companies',
     'employees',
     'salaries',
-    'withdrawals'
+    'withdrawals',
+    'idempotency',
 
 ]
 
@@ -137,16 +138,47 @@ STATIC_ROOT = BASE_DIR /'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# In-memory by default. With several workers point it at a shared cache so invalidations reach
+# all of them, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://...
+# The withdrawal summary is not cached on the database backend, it would cost more queries than it saves.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'ramcompany'),
+    },
+    # Throttle counters (ramcompany/throttling.py), never on the database: they are written on every attempt
+    'throttle': {
+        'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'ramcompany-throttle'),
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'ramcompany.authentication.ProfileJWTAuthentication',
     ),
+    # Scopes used by ramcompany/throttling.py, checked before the view hashes a password or touches the DB
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '20/min',
+        'login_username': '5/min',
+        'register': '20/hour',
+        'password_change': '5/hour',
+        'withdrawal': '10/min',
+    },
 }
 
 
 
 from datetime import timedelta
 
+AUTHENTICATION_BACKENDS = [
+    'ramcompany.backends.ProfileModelBackend',
+]
+
+# 'off' (the default, last_login is not written), 'immediate' or 'deferred'
+# (buffered per process and written in batches by a background thread)
+LAST_LOGIN_UPDATES = os.getenv('LAST_LOGIN_UPDATES', 'off')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days = 31),
     'REFRESH_TOKEN_LIFETIME': timedelta(weeks = 52),
@@ -157,4 +189,16 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+WITHDRAWAL_SUMMARY_CACHE_TTL = 300
+
+COMPANY_DIRECTORY_CACHE_TTL = 300
+
+# Threads per process that resize uploaded company images into their variants
+IMAGE_VARIANT_WORKERS = 2
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours = 24)
+
+# A key whose request never finished (worker killed) can be used again after this
+IDEMPOTENCY_LEASE = timedelta(seconds = 60)
\ No newline at end of file
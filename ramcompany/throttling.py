@@ -0,0 +1,97 @@
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.throttling import SimpleRateThrottle
+
+# Memory or Redis (settings.CACHES['throttle']), so a throttled request costs no DB statement
+throttle_cache = ConnectionProxy(caches, 'throttle')
+
+
+class IPRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle keyed by client IP, for endpoints open to anonymous users.
+    """
+    cache = throttle_cache
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class UserOrIPRateThrottle(SimpleRateThrottle):
+    """
+    Sliding-window throttle keyed by user id, or by IP for anonymous requests.
+    """
+    cache = throttle_cache
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident
+        }
+
+
+class LoginRateThrottle(IPRateThrottle):
+    scope = 'login'
+
+
+class LoginUsernameRateThrottle(SimpleRateThrottle):
+    """
+    Limits wrong passwords for one account from one client.
+    Only failed attempts count (record_failure, called on user_login_failed), and the key
+    includes the IP, so nobody can lock the owner of an account out of it.
+    """
+    cache = throttle_cache
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view=None):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': f'{username.strip().lower()[:150]}:{self.get_ident(request)}'
+        }
+
+    def throttle_success(self):
+        # The attempt is not counted here, it may succeed
+        return True
+
+    def record_failure(self, request):
+        key = self.get_cache_key(request)
+        if key is None or self.rate is None:
+            return
+        now = self.timer()
+        history = [moment for moment in self.cache.get(key, []) if moment > now - self.duration]
+        history.insert(0, now)
+        self.cache.set(key, history, self.duration)
+
+
+def _record_failed_login(sender, credentials, request=None, **kwargs):
+    # request is the DRF request when the login serializer got it in its context
+    if request is not None and hasattr(request, 'data'):
+        LoginUsernameRateThrottle().record_failure(request)
+
+
+user_login_failed.connect(_record_failed_login, dispatch_uid='login-username-throttle')
+
+
+class RegisterRateThrottle(IPRateThrottle):
+    scope = 'register'
+
+
+class PasswordChangeRateThrottle(UserOrIPRateThrottle):
+    scope = 'password_change'
+
+
+class WithdrawalRateThrottle(UserOrIPRateThrottle):
+    scope = 'withdrawal'
+
+
+LOGIN_THROTTLES = [LoginRateThrottle, LoginUsernameRateThrottle]
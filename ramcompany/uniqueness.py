@@ -0,0 +1,16 @@
+from django.db.models import CharField, Value
+
+
+def find_existing(checks):
+    """
+    Run many existence checks in a single UNION ALL query.
+    checks maps a label to a filtered queryset; return the set of labels whose queryset matched a row.
+    """
+    labelled = [
+        queryset.order_by().annotate(matched=Value(label, output_field=CharField())).values_list('matched', flat=True)
+        for label, queryset in checks.items()
+    ]
+    if not labelled:
+        return set()
+    first, *rest = labelled
+    return set(first.union(*rest, all=True)) if rest else set(first)
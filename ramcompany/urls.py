@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import unified_login ,about_me ,update_self
+from .views import unified_login ,unified_login_async ,about_me ,update_self
 
 
 urlpatterns = [
@@ -28,6 +28,7 @@ urlpatterns = [
     path('salary/' , include('salaries.urls')),
     path('withdrawals/' , include('withdrawals.urls')),
     path('api/login/' , unified_login , name = "unified-login"),
+    path('api/login/async/' , unified_login_async , name = "unified-login-async"),
     path('api/about/self/' , about_me ,name = "about-me"),
     path('api/update/self/', update_self ,name = "self-update")
 
@@ -1,36 +1,61 @@
-from rest_framework.decorators import api_view , permission_classes
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.decorators import api_view , permission_classes , throttle_classes
 from rest_framework.permissions import AllowAny , IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import UnifiedTokenObtainPairSerializer
+from .principal import get_principal
+from .throttling import LOGIN_THROTTLES
 from companies.serializers import CompanySerializer
 from employees.serializers import EmployeeSerializer
 from rest_framework.response import Response
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LOGIN_THROTTLES)
 def unified_login(request):
-    serializer = UnifiedTokenObtainPairSerializer(data = request.data)
+    serializer = UnifiedTokenObtainPairSerializer(data = request.data , context = {'request' : request})
     serializer.is_valid(raise_exception = True)
     return Response(serializer.validated_data , status = status.HTTP_200_OK)
 
+
+def _unified_login_in_worker_thread(request):
+    # The thread pool keeps its threads, so their connections are not closed at the end of the request
+    close_old_connections()
+    try:
+        return unified_login(request)
+    finally:
+        close_old_connections()
+
+@csrf_exempt
+async def unified_login_async(request):
+    """
+    unified_login for ASGI workers.
+    The password hash runs in a thread pool so it blocks neither the event loop
+    nor the single thread Django uses for sync views.
+    """
+    return await sync_to_async(_unified_login_in_worker_thread, thread_sensitive = False)(request)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def about_me(request):
     user = request.user
+    principal = get_principal(request)
     user_type = None
     profile_data = None
     serializer = None
 
-    if hasattr(user , 'company_profile'):
+    if principal.is_company_owner:
         user_type = 'company'
-        profile = user.company_profile
+        profile = principal.company
         serializer =CompanySerializer(profile)
         profile_data = serializer.data
     
-    elif hasattr(user , 'employee_profile'):
+    elif principal.is_employee:
         user_type = "employee"
-        profile = user.employee_profile
+        profile = principal.employee
         serializer = EmployeeSerializer(profile)
         profile_data = serializer.data
     elif user.is_superuser:
@@ -54,14 +79,14 @@ def about_me(request):
 @api_view(['PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def update_self(request):
-    user = request.user
+    principal = get_principal(request)
     profile_instance = None
     serializer_class = None
-    if hasattr(user, 'company_profile'):
-        profile_instance = user.company_profile
+    if principal.is_company_owner:
+        profile_instance = principal.company
         serializer_class = CompanySerializer 
-    elif hasattr(user, 'employee_profile'):
-        profile_instance = user.employee_profile
+    elif principal.is_employee:
+        profile_instance = principal.employee
         serializer_class = EmployeeUpdateSerializer
     else:
         return Response({"detail": "No profile found for this user."}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,113 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import MonthlyPayslip, SalaryAdjustment
+from withdrawals.models import Withdrawal
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_COLUMNS = [
+    'record_type', 'record_id', 'payslip_id', 'contract_id', 'employee_id', 'employee_username',
+    'month', 'year', 'base_monthly_salary', 'total_additions', 'total_deductions', 'final_salary',
+    'adjustment_type', 'amount', 'reason', 'date',
+]
+
+
+class Echo:
+    """
+    كائن يشبه الملف ويعيد ما يكتب فيه، حتى يكتب csv.writer سطراً سطراً في الـ stream.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_in_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    يقرأ الـ queryset على دفعات حسب pk (keyset) حتى تبقى الذاكرة ثابتة،
+    لأن mysqlclient يحمل كل نتيجة الاستعلام في الذاكرة حتى مع iterator().
+    """
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1]['record_id']
+
+
+def export_rows(company, year, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    يولد سجلات كشوفات الرواتب ثم الحركات ثم السحوبات لشركة في سنة معينة كـ dicts.
+    """
+    payslips = MonthlyPayslip.objects.filter(
+        salary_contract__company=company,
+        year=year
+    ).values(
+        'month', 'year', 'base_monthly_salary', 'total_additions', 'total_deductions', 'final_salary',
+        record_id=F('pk'),
+        payslip_id=F('pk'),
+        contract_id=F('salary_contract_id'),
+        employee_id=F('salary_contract__employee_id'),
+        employee_username=F('salary_contract__employee__user__username')
+    )
+    for row in iter_in_chunks(payslips, chunk_size):
+        row['record_type'] = 'payslip'
+        yield row
+
+    adjustments = SalaryAdjustment.objects.filter(
+        payslip__salary_contract__company=company,
+        payslip__year=year
+    ).values(
+        'payslip_id', 'adjustment_type', 'amount', 'reason',
+        record_id=F('pk'),
+        contract_id=F('payslip__salary_contract_id'),
+        employee_id=F('payslip__salary_contract__employee_id'),
+        employee_username=F('payslip__salary_contract__employee__user__username'),
+        month=F('payslip__month'),
+        year=F('payslip__year'),
+        date=F('created_at')
+    )
+    for row in iter_in_chunks(adjustments, chunk_size):
+        row['record_type'] = 'adjustment'
+        yield row
+
+    withdrawals = Withdrawal.objects.filter(
+        payslip__salary_contract__company=company,
+        payslip__year=year
+    ).values(
+        'payslip_id', 'amount', 'date',
+        record_id=F('pk'),
+        contract_id=F('payslip__salary_contract_id'),
+        employee_id=F('payslip__salary_contract__employee_id'),
+        employee_username=F('payslip__salary_contract__employee__user__username'),
+        month=F('payslip__month'),
+        year=F('payslip__year')
+    )
+    for row in iter_in_chunks(withdrawals, chunk_size):
+        row['record_type'] = 'withdrawal'
+        yield row
+
+
+def stream_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_COLUMNS, restval='')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def stream_export(company, year, export_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    rows = export_rows(company, year, chunk_size)
+    if export_format == 'ndjson':
+        return stream_ndjson(rows)
+    return stream_csv(rows)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from salaries.models import PayrollRun
+from salaries.payroll import DEFAULT_WORKERS, close_payroll_months
+
+
+class Command(BaseCommand):
+    help = "Close the payroll of a month and write its PayrollRun snapshot for every active company"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int, required=True)
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--company', type=int, nargs='+', help="Only close the payroll of these company ids")
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+
+    def handle(self, *args, **options):
+        month = options['month']
+        year = options['year']
+        if not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+
+        companies = Company.objects.filter(
+            is_active=True,
+            salary_contracts__payslips__month=month,
+            salary_contracts__payslips__year=year
+        ).exclude(
+            pk__in=PayrollRun.objects.filter(month=month, year=year).values('company_id')
+        ).distinct()
+        if options['company']:
+            companies = companies.filter(pk__in=options['company'])
+        companies = list(companies)
+        if not companies:
+            self.stdout.write(f"No open payroll to close for {month}/{year}.")
+            return
+
+        results = close_payroll_months(companies, month, year, workers=options['workers'])
+        closed = 0
+        for company_id, result in results.items():
+            if isinstance(result, Exception):
+                self.stderr.write(f"Company {company_id}: {result}")
+            else:
+                closed += 1
+        self.stdout.write(self.style.SUCCESS(f"Successfully closed {month}/{year} payroll for {closed} companies."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from salaries.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream the payslips, adjustments and withdrawals of a company for a year as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, required=True)
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--output-format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--file', help="Write to this path instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f"No company with id {options['company']}.")
+
+        chunks = stream_export(company, options['year'], options['output_format'], options['chunk_size'])
+        if options['file']:
+            with open(options['file'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['file']}."))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
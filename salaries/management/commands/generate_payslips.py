@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from salaries.services import CONTRACT_CHUNK_SIZE, active_contracts, rollover_contracts
+
+
+class Command(BaseCommand):
+    help = "Generate the monthly payslips of a year for every active salary contract"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, required=True)
+        parser.add_argument('--company', type=int, help="Only roll over the contracts of this company id")
+        parser.add_argument('--chunk-size', type=int, default=CONTRACT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        year = options['year']
+        if year < 2020:
+            raise CommandError("Year must be 2020 or later.")
+        contracts = active_contracts()
+        if options['company']:
+            if not Company.objects.filter(pk=options['company']).exists():
+                raise CommandError(f"No company with id {options['company']}.")
+            contracts = contracts.filter(company_id=options['company'])
+
+        created = rollover_contracts(year, contracts=contracts, chunk_size=options['chunk_size'])
+        if created > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully generated {created} payslips for {year}."))
+        else:
+            self.stdout.write(f"All active contracts already have payslips for {year}.")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from salaries.models import MonthlyPayslip
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored additions, deductions and final salary of payslips from their adjustments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--company', type=int, help="Only repair the payslips of this company id")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        payslips = MonthlyPayslip.objects.all()
+        if options['year']:
+            payslips = payslips.filter(year=options['year'])
+        if options['company']:
+            payslips = payslips.filter(salary_contract__company_id=options['company'])
+
+        ids = payslips.order_by('pk').values_list('pk', flat=True)
+        chunk_size = options['chunk_size']
+        repaired = 0
+        last_pk = 0
+        while True:
+            chunk = list(ids.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            repaired += MonthlyPayslip.objects.filter(pk__in=chunk).recalculate_totals()
+
+        if repaired > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully recomputed totals for {repaired} payslips."))
+        else:
+            self.stdout.write("No payslips to repair.")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from companies.models import Company
+from salaries.models import SalaryContract
+from salaries.services import reprice_payslips
+
+
+class Command(BaseCommand):
+    help = "Reprice the open payslips of a company from its contracts' current yearly salary"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, required=True)
+        parser.add_argument('--from-month', type=int)
+        parser.add_argument('--from-year', type=int)
+
+    def handle(self, *args, **options):
+        if not Company.objects.filter(pk=options['company']).exists():
+            raise CommandError(f"No company with id {options['company']}.")
+        now = timezone.now()
+        month = options['from_month'] or now.month
+        year = options['from_year'] or now.year
+        if not 1 <= month <= 12:
+            raise CommandError("Month must be between 1 and 12.")
+
+        contracts = SalaryContract.objects.filter(company_id=options['company']).values('pk')
+        repriced = reprice_payslips(contracts, year, month)
+        if repriced > 0:
+            self.stdout.write(self.style.SUCCESS(f"Successfully repriced {repriced} payslips from {month}/{year}."))
+        else:
+            self.stdout.write("No open payslips to reprice.")
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    MonthlyPayslip = apps.get_model('salaries', 'MonthlyPayslip')
+    SalaryAdjustment = apps.get_model('salaries', 'SalaryAdjustment')
+
+    def adjustments_total(adjustment_type):
+        total = SalaryAdjustment.objects.filter(
+            payslip=OuterRef('pk'),
+            adjustment_type=adjustment_type
+        ).values('payslip').annotate(total=Sum('amount')).values('total')
+        return Coalesce(
+            Subquery(total),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+
+    additions = adjustments_total('addition')
+    deductions = adjustments_total('deduction')
+    MonthlyPayslip.objects.update(
+        total_additions=additions,
+        total_deductions=deductions,
+        final_salary=F('base_monthly_salary') + additions - deductions
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salaries', '0003_alter_salaryadjustment_adjustment_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='final_salary',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='total_additions',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='total_deductions',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='monthlypayslip',
+            index=models.Index(fields=['year', 'month', 'final_salary'], name='salaries_mo_year_7fa3fb_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:50
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_alter_company_email'),
+        ('employees', '0003_remove_employee_position'),
+        ('salaries', '0004_monthlypayslip_stored_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='is_locked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)])),
+                ('year', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(2020)])),
+                ('employees_count', models.PositiveIntegerField(default=0)),
+                ('total_base_salary', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_additions', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_deductions', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_final_salary', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_payroll_runs', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_runs', to='companies.company')),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('company', 'month', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollRunLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_username', models.CharField(max_length=150)),
+                ('base_monthly_salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_additions', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_deductions', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('final_salary', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('employee', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_lines', to='employees.employee')),
+                ('payroll_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='salaries.payrollrun')),
+                ('payslip', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_line', to='salaries.monthlypayslip')),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:52
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Round
+
+
+def backfill_withdrawal_limit(apps, schema_editor):
+    MonthlyPayslip = apps.get_model('salaries', 'MonthlyPayslip')
+    SalaryContract = apps.get_model('salaries', 'SalaryContract')
+    percentage = SalaryContract.objects.filter(
+        pk=OuterRef('salary_contract_id')
+    ).values('withdraw_allowed_percentage')[:1]
+    MonthlyPayslip.objects.update(
+        withdrawal_limit=Round(
+            ExpressionWrapper(
+                F('base_monthly_salary') * Subquery(percentage) / Value(Decimal('100')),
+                output_field=DecimalField(max_digits=14, decimal_places=4)
+            ),
+            2,
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salaries', '0005_payrollrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='withdrawal_limit',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='monthlypayslip',
+            name='withdrawn_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_withdrawal_limit, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,28 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.exceptions import ValidationError
+from django.contrib.auth.models import User
 from companies.models import Company
 from employees.models import Employee
+from ramcompany.dirty_fields import DirtyFieldsMixin
 from django.utils import timezone
 import datetime
+from decimal import Decimal, ROUND_HALF_UP
 
-class SalaryContract(models.Model):
+CENT = Decimal('0.01')
+
+
+def round_money(value):
+    """
+    تقريب المبلغ إلى سنتين بقاعدة نصف للأعلى، وهي نفس قاعدة ROUND في SQL
+    التي تستخدمها العمليات المجمعة، حتى تتطابق المجاميع المخزنة مهما كان المسار.
+    """
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class SalaryContract(DirtyFieldsMixin, models.Model):
     employee = models.OneToOneField(Employee, on_delete=models.CASCADE, related_name="salary_contract")
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="salary_contracts")
     yearly_salary = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
@@ -16,52 +33,103 @@ class SalaryContract(models.Model):
     
     @property
     def monthly_salary(self):
-        return self.yearly_salary / 12
+        return round_money(Decimal(self.yearly_salary) / 12)
+
+    def withdrawal_limit_for(self, base_monthly_salary):
+        """
+        الحد الأعلى للسحب من كشف راتب بهذا الراتب الأساسي.
+        """
+        base_monthly_salary = round_money(base_monthly_salary)
+        return round_money(base_monthly_salary * Decimal(self.withdraw_allowed_percentage) / 100)
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs) 
         
         if is_new:
-            current_year = timezone.now().year
-            for month in range(1, 13):
-                MonthlyPayslip.objects.create(
-                    salary_contract=self,
-                    month=month,
-                    year=current_year,
-                    base_monthly_salary=self.monthly_salary
-                )
+            from .services import materialize_contract_year
+            materialize_contract_year(self, timezone.now().year)
 
     def __str__(self):
         return f"عقد راتب لـ {self.employee.user.username}"
 
 
+def adjustments_total(adjustment_type):
+    """
+    مجموع حركات نوع معين لكل كشف راتب، كاستعلام فرعي يستخدم داخل UPDATE.
+    """
+    total = SalaryAdjustment.objects.filter(
+        payslip=OuterRef('pk'),
+        adjustment_type=adjustment_type
+    ).values('payslip').annotate(total=Sum('amount')).values('total')
+    return Coalesce(
+        Subquery(total),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+class MonthlyPayslipQuerySet(models.QuerySet):
+
+    def apply_adjustment(self, adjustment_type, amount):
+        """
+        يضيف أثر حركة جديدة على المجاميع المخزنة بعملية UPDATE واحدة.
+        """
+        if adjustment_type == 'addition':
+            return self.update(
+                total_additions=F('total_additions') + amount,
+                final_salary=F('final_salary') + amount
+            )
+        return self.update(
+            total_deductions=F('total_deductions') + amount,
+            final_salary=F('final_salary') - amount
+        )
+
+    def recalculate_totals(self):
+        """
+        يعيد حساب المجاميع المخزنة من جدول الحركات مباشرة.
+        """
+        additions = adjustments_total('addition')
+        deductions = adjustments_total('deduction')
+        return self.update(
+            total_additions=additions,
+            total_deductions=deductions,
+            final_salary=F('base_monthly_salary') + additions - deductions
+        )
+
+
 class MonthlyPayslip(models.Model):
     salary_contract = models.ForeignKey(SalaryContract, on_delete=models.CASCADE, related_name="payslips")
     month = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(12)])
     year = models.PositiveIntegerField(validators=[MinValueValidator(2020)])
     base_monthly_salary = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    # مجاميع مخزنة يتم تحديثها مع كل حركة راتب حتى لا نحسبها عند كل قراءة
+    total_additions = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    total_deductions = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    final_salary = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    # يصبح True عند إغلاق رواتب الشهر (PayrollRun) ولا يسمح بعدها بأي حركة جديدة
+    is_locked = models.BooleanField(default=False)
+    # عداد السحوبات والحد المسموح به، يتم حجز المبلغ بعملية UPDATE شرطية واحدة
+    withdrawal_limit = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    withdrawn_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+
+    objects = MonthlyPayslipQuerySet.as_manager()
 
     class Meta:
         unique_together = ('salary_contract', 'month', 'year')
+        indexes = [
+            models.Index(fields=['year', 'month', 'final_salary']),
+        ]
 
-    @property
-    def total_additions(self):
-        return sum(adj.amount for adj in self.adjustments.filter(adjustment_type='addition'))
-
-    @property
-    def total_deductions(self):
-        return sum(adj.amount for adj in self.adjustments.filter(adjustment_type='deduction'))
-
-    @property
-    def final_salary(self):
-        return self.base_monthly_salary + self.total_additions - self.total_deductions
+    def save(self, *args, **kwargs):
+        self.final_salary = self.base_monthly_salary + self.total_additions - self.total_deductions
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Salary statement for {self.salary_contract.employee.user.username} - شهر {self.month}/{self.year}"
 
 
-class SalaryAdjustment(models.Model):
+class SalaryAdjustment(DirtyFieldsMixin, models.Model):
     ADJUSTMENT_TYPES = [
         ('addition', 'Addition'),
         ('deduction', 'Deduction'),
@@ -72,6 +140,80 @@ class SalaryAdjustment(models.Model):
     reason = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                payslip_ids = {self.payslip_id}
+                updated = MonthlyPayslip.objects.filter(pk=self.payslip_id, is_locked=False).apply_adjustment(
+                    self.adjustment_type, self.amount
+                )
+            else:
+                if not self.saved_changes:
+                    return
+                # نقل الحركة إلى كشف آخر يغير مجاميع الكشفين
+                payslip_ids = {self.payslip_id, self.saved_changes.get('payslip_id') or self.payslip_id}
+                updated = MonthlyPayslip.objects.filter(pk__in=payslip_ids, is_locked=False).recalculate_totals()
+            if updated != len(payslip_ids):
+                raise ValidationError("Payroll for this month is closed, adjustments are not allowed.")
+
+    def delete(self, *args, **kwargs):
+        # الكشف المحفوظ في قاعدة البيانات، قد يختلف عن payslip_id إذا تغير بدون حفظ
+        payslip_ids = {self.payslip_id, self.get_dirty_fields().get('payslip_id') or self.payslip_id}
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            updated = MonthlyPayslip.objects.filter(pk__in=payslip_ids, is_locked=False).recalculate_totals()
+            if updated != len(payslip_ids):
+                raise ValidationError("Payroll for this month is closed, adjustments are not allowed.")
+        return result
+
     def __str__(self):
         return f"{self.get_adjustment_type_display()} بقيمة {self.amount} لـ {self.payslip}"
 
+
+class PayrollRun(models.Model):
+    """
+    نسخة ثابتة (snapshot) من رواتب شركة لشهر معين بعد إغلاقه.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name="payroll_runs")
+    month = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(12)])
+    year = models.PositiveIntegerField(validators=[MinValueValidator(2020)])
+    employees_count = models.PositiveIntegerField(default=0)
+    total_base_salary = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_additions = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_deductions = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_final_salary = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="closed_payroll_runs")
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('company', 'month', 'year')
+        ordering = ['-year', '-month']
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("A closed payroll run can not be modified.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Payroll {self.month}/{self.year} - {self.company.name}"
+
+
+class PayrollRunLine(models.Model):
+    payroll_run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name="lines")
+    payslip = models.OneToOneField(MonthlyPayslip, on_delete=models.SET_NULL, null=True, related_name="payroll_line")
+    employee = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, related_name="payroll_lines")
+    employee_username = models.CharField(max_length=150)
+    base_monthly_salary = models.DecimalField(max_digits=10, decimal_places=2)
+    total_additions = models.DecimalField(max_digits=10, decimal_places=2)
+    total_deductions = models.DecimalField(max_digits=10, decimal_places=2)
+    final_salary = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("A closed payroll line can not be modified.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.employee_username} - {self.final_salary}"
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import MonthlyPayslip, PayrollRun, PayrollRunLine
+
+LINE_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 4
+
+
+class PayrollAlreadyClosed(Exception):
+    pass
+
+
+def _adjustments_sum(adjustment_type):
+    return Coalesce(
+        Sum('adjustments__amount', filter=Q(adjustments__adjustment_type=adjustment_type)),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def compute_payroll(company, month, year):
+    """
+    يحسب الراتب النهائي لكل عقد في الشركة لشهر معين باستعلام GROUP BY واحد
+    مباشرة من جدول الحركات (وليس من المجاميع المخزنة).
+    """
+    return (
+        MonthlyPayslip.objects.filter(
+            salary_contract__company=company,
+            month=month,
+            year=year
+        )
+        .values(
+            'pk',
+            'base_monthly_salary',
+            employee_id=F('salary_contract__employee_id'),
+            employee_username=F('salary_contract__employee__user__username')
+        )
+        .annotate(
+            additions=_adjustments_sum('addition'),
+            deductions=_adjustments_sum('deduction')
+        )
+        .order_by('pk')
+    )
+
+
+def close_payroll_month(company, month, year, closed_by=None):
+    """
+    يغلق رواتب شهر لشركة معينة: يحسب الرواتب، يكتب PayrollRun مع سطوره،
+    ويقفل كشوفات الشهر ضد أي حركة جديدة. كل ذلك في transaction واحدة.
+    """
+    with transaction.atomic():
+        if PayrollRun.objects.filter(company=company, month=month, year=year).exists():
+            raise PayrollAlreadyClosed(f"Payroll {month}/{year} is already closed.")
+
+        payslips = MonthlyPayslip.objects.filter(
+            salary_contract__company=company,
+            month=month,
+            year=year
+        )
+        # قفل الكشوفات حتى لا تضاف حركة أثناء الحساب
+        payslip_ids = list(payslips.select_for_update().values_list('pk', flat=True))
+        rows = list(compute_payroll(company, month, year))
+
+        run = PayrollRun(
+            company=company,
+            month=month,
+            year=year,
+            closed_by=closed_by,
+            employees_count=len(rows)
+        )
+        lines = []
+        for row in rows:
+            final_salary = row['base_monthly_salary'] + row['additions'] - row['deductions']
+            run.total_base_salary += row['base_monthly_salary']
+            run.total_additions += row['additions']
+            run.total_deductions += row['deductions']
+            run.total_final_salary += final_salary
+            lines.append(PayrollRunLine(
+                payslip_id=row['pk'],
+                employee_id=row['employee_id'],
+                employee_username=row['employee_username'],
+                base_monthly_salary=row['base_monthly_salary'],
+                total_additions=row['additions'],
+                total_deductions=row['deductions'],
+                final_salary=final_salary
+            ))
+        try:
+            with transaction.atomic():
+                run.save()
+        except IntegrityError:
+            raise PayrollAlreadyClosed(f"Payroll {month}/{year} is already closed.")
+        for line in lines:
+            line.payroll_run = run
+        PayrollRunLine.objects.bulk_create(lines, batch_size=LINE_BATCH_SIZE)
+
+        locked = MonthlyPayslip.objects.filter(pk__in=payslip_ids)
+        locked.recalculate_totals()
+        locked.update(is_locked=True)
+    return run
+
+
+def _close_in_worker(company, month, year, closed_by):
+    try:
+        return close_payroll_month(company, month, year, closed_by=closed_by)
+    finally:
+        # كل thread يفتح اتصالاً خاصاً به مع قاعدة البيانات
+        connection.close()
+
+
+def close_payroll_months(companies, month, year, closed_by=None, workers=DEFAULT_WORKERS):
+    """
+    يغلق رواتب الشهر لعدة شركات بالتوازي. تعيد dict: company_id -> PayrollRun أو Exception.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            company.pk: executor.submit(_close_in_worker, company, month, year, closed_by)
+            for company in companies
+        }
+        for company_id, future in futures.items():
+            try:
+                results[company_id] = future.result()
+            except Exception as error:
+                results[company_id] = error
+    return results
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import SalaryContract, MonthlyPayslip, SalaryAdjustment
+from .models import SalaryContract, MonthlyPayslip, SalaryAdjustment, PayrollRun, PayrollRunLine
 from employees.models import Employee
+from ramcompany.principal import get_principal
 
 
 class SalaryAdjustmentCreateSerializer(serializers.ModelSerializer):
@@ -10,6 +11,25 @@ class SalaryAdjustmentCreateSerializer(serializers.ModelSerializer):
         fields = ['adjustment_type', 'amount', 'reason']
 
 
+class BulkSalaryAdjustmentSerializer(serializers.Serializer):
+    """
+    حركة واحدة (قالب) تطبق على مجموعة كشوفات رواتب لشهر معين.
+    إذا لم يتم إرسال employee_ids أو contract_ids تطبق على كل كشوفات الشهر في الشركة.
+    """
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    year = serializers.IntegerField(min_value=2020)
+    employee_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=5000)
+    contract_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=5000)
+    adjustment_type = serializers.ChoiceField(choices=SalaryAdjustment.ADJUSTMENT_TYPES)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    reason = serializers.CharField(max_length=255)
+
+    def validate(self, data):
+        if 'employee_ids' in data and 'contract_ids' in data:
+            raise serializers.ValidationError("Send either employee_ids or contract_ids, not both.")
+        return data
+
+
 class SalaryAdjustmentDetailSerializer(serializers.ModelSerializer):
     adjustment_id = serializers.IntegerField(source='id', read_only=True)
 
@@ -33,6 +53,15 @@ class MonthlyPayslipSerializer(serializers.ModelSerializer):
             'adjustments'
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # الشهر المغلق يعرض المبالغ المعتمدة في مسير الرواتب، لا المجاميع الحالية
+        line = getattr(instance, 'payroll_line', None) if instance.is_locked else None
+        if line is not None:
+            for name in ('total_additions', 'total_deductions', 'final_salary'):
+                data[name] = self.fields[name].to_representation(getattr(line, name))
+        return data
+
 
 class SalaryContractSerializer(serializers.ModelSerializer):
     employee_id = serializers.PrimaryKeyRelatedField(queryset=Employee.objects.all(), source='employee')    
@@ -49,7 +78,7 @@ class SalaryContractSerializer(serializers.ModelSerializer):
         return employee
 
     def create(self, validated_data):
-        company = self.context['request'].user.company_profile
+        company = get_principal(self.context['request']).company
         validated_data['company'] = company
         contract = SalaryContract.objects.create(**validated_data)
         return contract
@@ -71,4 +100,67 @@ class SalaryContractDetailSerializer(serializers.ModelSerializer):
                 ]
 
 
+class PayslipYearTotalsSerializer(serializers.Serializer):
+    year = serializers.IntegerField()
+    payslips_count = serializers.IntegerField()
+    total_base_salary = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_additions = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_deductions = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_final_salary = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class SalaryContractSummarySerializer(serializers.ModelSerializer):
+    """
+    نسخة مختصرة من عقد الراتب تعرض مجاميع كل سنة بدلاً من كل كشوفات الرواتب.
+    يجب أن يضع الـ view القيمة yearly_totals على كل عقد قبل التسلسل.
+    """
+    contract_id = serializers.IntegerField(source='id', read_only=True)
+    employee_username = serializers.CharField(source='employee.user.username', read_only=True)
+    company_name = serializers.CharField(source='company.name', read_only=True)
+    monthly_salary = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    yearly_totals = PayslipYearTotalsSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = SalaryContract
+        fields = [
+                    'contract_id', 'employee_username', 'company_name',
+                    'yearly_salary', 'monthly_salary', 'withdraw_allowed_percentage',
+                    'yearly_totals'
+                ]
+
+
+class ContractRepriceSerializer(serializers.Serializer):
+    """
+    الشهر الذي يبدأ منه تطبيق الراتب الجديد على كشوفات الرواتب (افتراضياً الشهر الحالي).
+    """
+    effective_from_month = serializers.IntegerField(min_value=1, max_value=12, required=False)
+    effective_from_year = serializers.IntegerField(min_value=2020, required=False)
+
+
+class PayrollCloseSerializer(serializers.Serializer):
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    year = serializers.IntegerField(min_value=2020)
+
+
+class PayrollRunLineSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PayrollRunLine
+        fields = [
+            'payslip_id', 'employee_id', 'employee_username', 'base_monthly_salary',
+            'total_additions', 'total_deductions', 'final_salary'
+        ]
+
 
+class PayrollRunSerializer(serializers.ModelSerializer):
+    payroll_run_id = serializers.IntegerField(source='id', read_only=True)
+    closed_by_username = serializers.CharField(source='closed_by.username', read_only=True, allow_null=True)
+    lines = PayrollRunLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PayrollRun
+        fields = [
+            'payroll_run_id', 'month', 'year', 'employees_count',
+            'total_base_salary', 'total_additions', 'total_deductions', 'total_final_salary',
+            'closed_by_username', 'closed_at', 'lines'
+        ]
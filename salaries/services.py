@@ -0,0 +1,216 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import SalaryContract, MonthlyPayslip, SalaryAdjustment
+from withdrawals.cache import invalidate_company_summaries
+
+# عدد العقود التي تتم معالجتها في كل دفعة (كل عقد = 12 كشف راتب)
+CONTRACT_CHUNK_SIZE = 500
+PAYSLIP_BATCH_SIZE = 1000
+ADJUSTMENT_BATCH_SIZE = 1000
+
+
+def build_contract_year(contract, year):
+    """
+    يبني (بدون حفظ) كشوفات الرواتب الاثني عشر لعقد معين في سنة معينة.
+    """
+    monthly_salary = contract.monthly_salary
+    withdrawal_limit = contract.withdrawal_limit_for(monthly_salary)
+    return [
+        MonthlyPayslip(
+            salary_contract=contract,
+            month=month,
+            year=year,
+            base_monthly_salary=monthly_salary,
+            final_salary=monthly_salary,
+            withdrawal_limit=withdrawal_limit
+        )
+        for month in range(1, 13)
+    ]
+
+
+def materialize_contract_year(contract, year=None):
+    """
+    ينشئ كشوفات سنة كاملة لعقد جديد باستعلام INSERT واحد بدلاً من 12 استعلاماً.
+    """
+    if year is None:
+        year = timezone.now().year
+    return MonthlyPayslip.objects.bulk_create(build_contract_year(contract, year))
+
+
+def active_contracts():
+    return SalaryContract.objects.filter(
+        employee__is_active=True,
+        company__is_active=True
+    )
+
+
+def rollover_contracts(year, contracts=None, chunk_size=CONTRACT_CHUNK_SIZE):
+    """
+    ينقل كل العقود الفعالة إلى سنة جديدة على دفعات.
+    العملية idempotent: الأشهر الموجودة مسبقاً لا يعاد إنشاؤها، و ignore_conflicts
+    يحمي من التعارض مع unique_together في حال تشغيل أكثر من عملية بنفس الوقت.
+    تعيد عدد الكشوفات التي تم إنشاؤها.
+    """
+    if contracts is None:
+        contracts = active_contracts()
+    contracts = contracts.only('id', 'yearly_salary', 'withdraw_allowed_percentage').order_by('pk')
+
+    created = 0
+    last_pk = 0
+    while True:
+        chunk = list(contracts.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        contract_ids = [contract.pk for contract in chunk]
+        existing = set(
+            MonthlyPayslip.objects.filter(
+                salary_contract_id__in=contract_ids,
+                year=year
+            ).values_list('salary_contract_id', 'month')
+        )
+        payslips = [
+            payslip
+            for contract in chunk
+            for payslip in build_contract_year(contract, year)
+            if (contract.pk, payslip.month) not in existing
+        ]
+        if payslips:
+            # ignore_conflicts لا يخبر بعدد الصفوف المضافة فعلاً، نعدها قبل وبعد الإدخال
+            chunk_payslips = MonthlyPayslip.objects.filter(salary_contract_id__in=contract_ids, year=year)
+            with transaction.atomic():
+                before = chunk_payslips.count()
+                MonthlyPayslip.objects.bulk_create(
+                    payslips,
+                    batch_size=PAYSLIP_BATCH_SIZE,
+                    ignore_conflicts=True
+                )
+                created += chunk_payslips.count() - before
+    return created
+
+
+def apply_bulk_adjustment(company, month, year, adjustment_type, amount, reason,
+                          employee_ids=None, contract_ids=None):
+    """
+    يطبق نفس الحركة على كل كشوفات الشهر المطلوبة في عملية واحدة:
+    استعلام لتحديد الكشوفات، INSERT مجمع للحركات، و UPDATE واحد للمجاميع المخزنة.
+    تعيد نتيجة لكل هدف (موظف، عقد، أو كشف راتب عند عدم تحديد أهداف).
+    """
+    payslips = MonthlyPayslip.objects.filter(
+        salary_contract__company=company,
+        month=month,
+        year=year
+    )
+    if employee_ids is not None:
+        target_field = 'employee_id'
+        targets = list(dict.fromkeys(employee_ids))
+        payslips = payslips.filter(salary_contract__employee_id__in=targets)
+    elif contract_ids is not None:
+        target_field = 'contract_id'
+        targets = list(dict.fromkeys(contract_ids))
+        payslips = payslips.filter(salary_contract_id__in=targets)
+    else:
+        target_field = None
+        targets = None
+
+    with transaction.atomic():
+        rows = list(payslips.order_by('pk').values_list(
+            'pk', 'salary_contract_id', 'salary_contract__employee_id', 'is_locked'
+        ))
+        payslip_ids = [row[0] for row in rows if not row[3]]
+        SalaryAdjustment.objects.bulk_create(
+            [
+                SalaryAdjustment(
+                    payslip_id=payslip_id,
+                    adjustment_type=adjustment_type,
+                    amount=amount,
+                    reason=reason
+                )
+                for payslip_id in payslip_ids
+            ],
+            batch_size=ADJUSTMENT_BATCH_SIZE
+        )
+        if payslip_ids:
+            updated = MonthlyPayslip.objects.filter(
+                pk__in=payslip_ids,
+                is_locked=False
+            ).apply_adjustment(adjustment_type, amount)
+            if updated != len(payslip_ids):
+                # تم إغلاق الشهر أثناء العملية، نلغي كل الحركات
+                raise ValidationError("Payroll for this month is closed, adjustments are not allowed.")
+
+    def row_status(is_locked):
+        return 'locked' if is_locked else 'applied'
+
+    if target_field is None:
+        return [
+            {
+                'payslip_id': payslip_id,
+                'contract_id': contract_id,
+                'employee_id': employee_id,
+                'status': row_status(is_locked)
+            }
+            for payslip_id, contract_id, employee_id, is_locked in rows
+        ]
+    found = {
+        'employee_id': {employee_id: (payslip_id, is_locked) for payslip_id, _, employee_id, is_locked in rows},
+        'contract_id': {contract_id: (payslip_id, is_locked) for payslip_id, contract_id, _, is_locked in rows},
+    }[target_field]
+    results = []
+    for target in targets:
+        if target in found:
+            payslip_id, is_locked = found[target]
+            results.append({target_field: target, 'payslip_id': payslip_id, 'status': row_status(is_locked)})
+        else:
+            results.append({target_field: target, 'payslip_id': None, 'status': 'not_found'})
+    return results
+
+
+def reprice_payslips(contracts, effective_year, effective_month):
+    """
+    يحدث الراتب الأساسي وحد السحب لكل كشوفات العقود غير المغلقة ابتداءً من شهر معين
+    حسب الراتب السنوي ونسبة السحب الحاليين للعقد، ويعيد حساب الراتب النهائي.
+    كل ذلك في استعلام UPDATE واحد مهما كان عدد العقود، ثم يلغي ملخصات السحب المخزنة.
+    تعيد عدد الكشوفات التي تم تحديثها.
+    """
+    contract = SalaryContract.objects.filter(pk=OuterRef('salary_contract_id'))
+    monthly_salary = Round(
+        ExpressionWrapper(
+            Subquery(contract.values('yearly_salary')[:1]) / Value(Decimal('12')),
+            output_field=DecimalField(max_digits=14, decimal_places=4)
+        ),
+        2,
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    withdrawal_limit = Round(
+        ExpressionWrapper(
+            monthly_salary * Subquery(contract.values('withdraw_allowed_percentage')[:1]) / Value(Decimal('100')),
+            output_field=DecimalField(max_digits=14, decimal_places=4)
+        ),
+        2,
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    payslips = MonthlyPayslip.objects.filter(
+        salary_contract__in=contracts,
+        is_locked=False
+    ).filter(
+        Q(year__gt=effective_year) | Q(year=effective_year, month__gte=effective_month)
+    )
+    repriced = payslips.update(
+        base_monthly_salary=monthly_salary,
+        final_salary=monthly_salary + F('total_additions') - F('total_deductions'),
+        withdrawal_limit=withdrawal_limit
+    )
+    if repriced:
+        # ملخص السحب المخزن في الـ cache يعرض الراتب والحد، لذلك نلغيه لكل شركة تأثرت
+        company_ids = set(
+            SalaryContract.objects.filter(pk__in=contracts).values_list('company_id', flat=True)
+        )
+        transaction.on_commit(lambda: invalidate_company_summaries(company_ids))
+    return repriced
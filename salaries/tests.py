@@ -1,3 +1,292 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from employees.models import Employee
+from idempotency.models import IdempotencyKey
+from .models import MonthlyPayslip, PayrollRunLine, SalaryAdjustment, SalaryContract, round_money
+from .payroll import PayrollAlreadyClosed, close_payroll_month
+from . import services
+from .services import apply_bulk_adjustment, reprice_payslips, rollover_contracts
+
+
+def create_contract(company, username, yearly_salary='12000.00', percentage=50):
+    employee = Employee.objects.create(user=User.objects.create_user(username), company=company)
+    return SalaryContract.objects.create(
+        employee=employee,
+        company=company,
+        yearly_salary=Decimal(yearly_salary),
+        withdraw_allowed_percentage=percentage
+    )
+
+
+class SalaryTestCase(TestCase):
+
+    def setUp(self):
+        self.year = timezone.now().year
+        self.company = Company.objects.create(
+            owner=User.objects.create_user('owner'),
+            name='Acme',
+            phone_number='+963944000001'
+        )
+        self.contract = create_contract(self.company, 'employee')
+
+    def payslip(self, month, contract=None):
+        return MonthlyPayslip.objects.get(salary_contract=contract or self.contract, month=month, year=self.year)
+
+    def assertTotals(self, payslip, additions, deductions, final_salary):
+        payslip.refresh_from_db()
+        self.assertEqual(
+            (payslip.total_additions, payslip.total_deductions, payslip.final_salary),
+            (Decimal(additions), Decimal(deductions), Decimal(final_salary))
+        )
+
+
+class PayslipTotalsTests(SalaryTestCase):
+
+    def test_new_contract_builds_the_year(self):
+        payslips = MonthlyPayslip.objects.filter(salary_contract=self.contract, year=self.year)
+        self.assertEqual(payslips.count(), 12)
+        self.assertTotals(self.payslip(1), '0.00', '0.00', '1000.00')
+        self.assertEqual(self.payslip(1).withdrawal_limit, Decimal('500.00'))
+
+    def test_adding_adjustments_updates_stored_totals(self):
+        payslip = self.payslip(1)
+        SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='addition', amount=Decimal('150.00'), reason='bonus')
+        SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='deduction', amount=Decimal('40.50'), reason='late')
+        self.assertTotals(payslip, '150.00', '40.50', '1109.50')
+
+    def test_editing_an_adjustment_recalculates_totals(self):
+        payslip = self.payslip(1)
+        adjustment = SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='addition', amount=Decimal('150.00'), reason='bonus')
+        adjustment = SalaryAdjustment.objects.get(pk=adjustment.pk)
+        adjustment.amount = Decimal('90.00')
+        adjustment.save()
+        self.assertTotals(payslip, '90.00', '0.00', '1090.00')
+
+        adjustment.adjustment_type = 'deduction'
+        adjustment.save()
+        self.assertTotals(payslip, '0.00', '90.00', '910.00')
+
+    def test_moving_an_adjustment_recalculates_both_payslips(self):
+        january, february = self.payslip(1), self.payslip(2)
+        adjustment = SalaryAdjustment.objects.create(payslip=january, adjustment_type='addition', amount=Decimal('100.00'), reason='bonus')
+        adjustment = SalaryAdjustment.objects.get(pk=adjustment.pk)
+        adjustment.payslip = february
+        adjustment.save()
+        self.assertTotals(january, '0.00', '0.00', '1000.00')
+        self.assertTotals(february, '100.00', '0.00', '1100.00')
+
+    def test_deleting_an_adjustment_recalculates_totals(self):
+        payslip = self.payslip(1)
+        SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='addition', amount=Decimal('100.00'), reason='bonus')
+        adjustment = SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='deduction', amount=Decimal('30.00'), reason='late')
+        SalaryAdjustment.objects.get(pk=adjustment.pk).delete()
+        self.assertTotals(payslip, '100.00', '0.00', '1100.00')
+
+    def test_adjustment_on_locked_payslip_is_rejected(self):
+        payslip = self.payslip(1)
+        MonthlyPayslip.objects.filter(pk=payslip.pk).update(is_locked=True)
+        with self.assertRaises(ValidationError):
+            SalaryAdjustment.objects.create(payslip=payslip, adjustment_type='addition', amount=Decimal('10.00'), reason='bonus')
+        self.assertFalse(SalaryAdjustment.objects.filter(payslip=payslip).exists())
+        self.assertTotals(payslip, '0.00', '0.00', '1000.00')
+
+    def test_moving_an_adjustment_into_a_locked_payslip_is_rejected(self):
+        january, february = self.payslip(1), self.payslip(2)
+        adjustment = SalaryAdjustment.objects.create(payslip=january, adjustment_type='addition', amount=Decimal('100.00'), reason='bonus')
+        MonthlyPayslip.objects.filter(pk=february.pk).update(is_locked=True)
+        adjustment = SalaryAdjustment.objects.get(pk=adjustment.pk)
+        adjustment.payslip = february
+        with self.assertRaises(ValidationError):
+            adjustment.save()
+        self.assertEqual(SalaryAdjustment.objects.get(pk=adjustment.pk).payslip_id, january.pk)
+        self.assertTotals(january, '100.00', '0.00', '1100.00')
+
+    def test_bulk_adjustment_matches_recalculated_totals(self):
+        other = create_contract(self.company, 'other', yearly_salary='24000.00')
+        results = apply_bulk_adjustment(self.company, 3, self.year, 'deduction', Decimal('25.00'), 'insurance')
+        self.assertEqual([result['status'] for result in results], ['applied', 'applied'])
+
+        stored = list(MonthlyPayslip.objects.filter(month=3, year=self.year).order_by('pk').values_list('final_salary', flat=True))
+        MonthlyPayslip.objects.filter(month=3, year=self.year).recalculate_totals()
+        recalculated = list(MonthlyPayslip.objects.filter(month=3, year=self.year).order_by('pk').values_list('final_salary', flat=True))
+        self.assertEqual(stored, recalculated)
+        self.assertTotals(self.payslip(3, other), '0.00', '25.00', '1975.00')
+
+
+class RepriceTests(SalaryTestCase):
+
+    def test_reprice_updates_open_months_from_the_effective_month(self):
+        SalaryAdjustment.objects.create(payslip=self.payslip(6), adjustment_type='addition', amount=Decimal('50.00'), reason='bonus')
+        SalaryContract.objects.filter(pk=self.contract.pk).update(yearly_salary=Decimal('24000.00'))
+
+        repriced = reprice_payslips(SalaryContract.objects.filter(pk=self.contract.pk), self.year, 6)
+
+        self.assertEqual(repriced, 7)
+        self.assertTotals(self.payslip(5), '0.00', '0.00', '1000.00')
+        self.assertTotals(self.payslip(6), '50.00', '0.00', '2050.00')
+        self.assertEqual(self.payslip(6).withdrawal_limit, Decimal('1000.00'))
+
+    def test_reprice_does_not_touch_locked_months(self):
+        MonthlyPayslip.objects.filter(salary_contract=self.contract, month__in=[7, 8]).update(is_locked=True)
+        SalaryContract.objects.filter(pk=self.contract.pk).update(yearly_salary=Decimal('24000.00'))
+
+        repriced = reprice_payslips(SalaryContract.objects.filter(pk=self.contract.pk), self.year, 6)
+
+        self.assertEqual(repriced, 5)
+        for month in (7, 8):
+            payslip = self.payslip(month)
+            self.assertEqual((payslip.base_monthly_salary, payslip.final_salary), (Decimal('1000.00'), Decimal('1000.00')))
+        self.assertEqual(self.payslip(9).base_monthly_salary, Decimal('2000.00'))
+
+    def test_reprice_rounds_like_new_payslips(self):
+        # 1000.14 / 12 = 83.345, half a cent in both paths
+        contract = create_contract(self.company, 'rounding', yearly_salary='1000.14', percentage=33)
+        built = self.payslip(1, contract)
+
+        reprice_payslips(SalaryContract.objects.filter(pk=contract.pk), self.year, 1)
+
+        repriced = self.payslip(1, contract)
+        self.assertEqual(built.base_monthly_salary, round_money(Decimal('1000.14') / 12))
+        self.assertEqual(
+            (repriced.base_monthly_salary, repriced.withdrawal_limit),
+            (built.base_monthly_salary, built.withdrawal_limit)
+        )
+
+
+class PayrollCloseTests(SalaryTestCase):
+
+    def test_close_snapshots_and_locks_the_month(self):
+        other = create_contract(self.company, 'other', yearly_salary='24000.00')
+        SalaryAdjustment.objects.create(payslip=self.payslip(4), adjustment_type='addition', amount=Decimal('100.00'), reason='bonus')
+        SalaryAdjustment.objects.create(payslip=self.payslip(4, other), adjustment_type='deduction', amount=Decimal('20.00'), reason='late')
+
+        run = close_payroll_month(self.company, 4, self.year)
+
+        self.assertEqual(run.employees_count, 2)
+        self.assertEqual(
+            (run.total_base_salary, run.total_additions, run.total_deductions, run.total_final_salary),
+            (Decimal('3000.00'), Decimal('100.00'), Decimal('20.00'), Decimal('3080.00'))
+        )
+        self.assertEqual(PayrollRunLine.objects.filter(payroll_run=run).count(), 2)
+        self.assertFalse(MonthlyPayslip.objects.filter(month=4, year=self.year, is_locked=False).exists())
+        self.assertFalse(MonthlyPayslip.objects.filter(month=5, year=self.year, is_locked=True).exists())
+
+    def test_closed_month_rejects_adjustments_and_a_second_close(self):
+        close_payroll_month(self.company, 4, self.year)
+        with self.assertRaises(ValidationError):
+            SalaryAdjustment.objects.create(payslip=self.payslip(4), adjustment_type='addition', amount=Decimal('10.00'), reason='bonus')
+        with self.assertRaises(PayrollAlreadyClosed):
+            close_payroll_month(self.company, 4, self.year)
+
+    def test_closed_payslip_is_served_from_the_payroll_snapshot(self):
+        SalaryAdjustment.objects.create(payslip=self.payslip(4), adjustment_type='addition', amount=Decimal('100.00'), reason='bonus')
+        close_payroll_month(self.company, 4, self.year)
+        # The live totals drift after the close, the approved amounts do not
+        MonthlyPayslip.objects.filter(pk=self.payslip(4).pk).update(final_salary=Decimal('1.00'))
+        client = APIClient()
+        client.force_authenticate(self.company.owner)
+
+        response = client.get(f'/salary/payslips/{self.payslip(4).pk}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['total_additions'], response.data['final_salary']),
+            ('100.00', '1100.00')
+        )
+        self.assertEqual(client.get(f'/salary/payslips/{self.payslip(5).pk}/').data['final_salary'], '1000.00')
+
+
+class RolloverTests(SalaryTestCase):
+
+    def test_rollover_builds_the_next_year_once(self):
+        other = create_contract(self.company, 'other', yearly_salary='24000.00')
+
+        self.assertEqual(rollover_contracts(self.year + 1, chunk_size=1), 24)
+        self.assertEqual(rollover_contracts(self.year + 1), 0)
+
+        payslip = MonthlyPayslip.objects.get(salary_contract=other, month=1, year=self.year + 1)
+        self.assertEqual((payslip.base_monthly_salary, payslip.final_salary), (Decimal('2000.00'), Decimal('2000.00')))
+        self.assertEqual(payslip.withdrawal_limit, Decimal('1000.00'))
+
+    def test_rollover_skips_inactive_employees(self):
+        Employee.objects.filter(pk=self.contract.employee_id).update(is_active=False)
+        self.assertEqual(rollover_contracts(self.year + 1), 0)
+
+    def test_rollover_counts_only_the_rows_it_inserted(self):
+        build_contract_year = services.build_contract_year
+
+        def build_after_a_concurrent_run(contract, year):
+            # Another run inserts January after this one read the existing months
+            MonthlyPayslip.objects.bulk_create(build_contract_year(contract, year)[:1])
+            return build_contract_year(contract, year)
+
+        with mock.patch.object(services, 'build_contract_year', build_after_a_concurrent_run):
+            self.assertEqual(rollover_contracts(self.year + 1), 11)
+        self.assertEqual(MonthlyPayslip.objects.filter(salary_contract=self.contract, year=self.year + 1).count(), 12)
+
+
+class IdempotentAdjustmentTests(SalaryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.company.owner)
+        self.url = f'/salary/payslips/{self.payslip(1).pk}/add-adjustment/'
+        self.body = {'adjustment_type': 'addition', 'amount': '150.00', 'reason': 'bonus'}
+
+    def post(self, body, key='retry-1'):
+        return self.client.post(self.url, body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post(self.body)
+        second = self.post(self.body)
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(SalaryAdjustment.objects.filter(payslip=self.payslip(1)).count(), 1)
+        self.assertTotals(self.payslip(1), '150.00', '0.00', '1150.00')
+
+    def test_same_key_with_another_payload_is_rejected(self):
+        self.post(self.body)
+        response = self.post({**self.body, 'amount': '200.00'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(SalaryAdjustment.objects.filter(payslip=self.payslip(1)).count(), 1)
+
+    def test_requests_without_a_key_are_not_deduplicated(self):
+        self.client.post(self.url, self.body, format='json')
+        self.client.post(self.url, self.body, format='json')
+        self.assertEqual(SalaryAdjustment.objects.filter(payslip=self.payslip(1)).count(), 2)
+
+    def test_key_still_being_processed_returns_409(self):
+        self.post(self.body)
+        IdempotencyKey.objects.update(response_status=None, response_body=None)
+        self.assertEqual(self.post(self.body).status_code, 409)
+        self.assertEqual(SalaryAdjustment.objects.filter(payslip=self.payslip(1)).count(), 1)
+
+    def test_expired_claim_is_taken_over(self):
+        # A worker that died mid-request left a claim without a response
+        self.post(self.body)
+        IdempotencyKey.objects.update(
+            response_status=None,
+            response_body=None,
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = self.post(self.body)
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.response_status, 201)
+        self.assertGreater(record.expires_at, timezone.now() + timedelta(hours=1))
@@ -35,5 +35,26 @@ urlpatterns = [
     # [POST] لإضافة حركة (حسم أو مكافأة) على كشف راتب شهري معين
     # POST -> /api/salaries/payslips/123/add-adjustment/
     path('payslips/<int:payslip_pk>/add-adjustment/', views.add_salary_adjustment, name='add-adjustment'),
-]
 
+    # [POST] لإضافة نفس الحركة على كشوفات عدة موظفين لشهر معين
+    # POST -> /api/salaries/payslips/bulk-adjustment/
+    path('payslips/bulk-adjustment/', views.bulk_salary_adjustment, name='bulk-adjustment'),
+
+
+    # --- 4. روابط خاصة بإغلاق رواتب الشهر (PayrollRun) ---
+
+    # [POST] لإغلاق رواتب شهر معين
+    # POST -> /api/salaries/payroll/close/
+    path('payroll/close/', views.payroll_close, name='payroll-close'),
+
+    # [GET] لعرض رواتب شهر مغلق
+    # GET -> /api/salaries/payroll/2025/9/
+    path('payroll/<int:year>/<int:month>/', views.payroll_run_detail, name='payroll-detail'),
+
+
+    # --- 5. تصدير بيانات الرواتب ---
+
+    # [GET] لتصدير رواتب سنة كاملة (csv أو ndjson)
+    # GET -> /api/salaries/export/2025/?output=ndjson
+    path('export/<int:year>/', views.payroll_export, name='payroll-export'),
+]
@@ -2,15 +2,53 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Prefetch, Sum
 
-from .models import SalaryContract, MonthlyPayslip
+from .models import SalaryContract, MonthlyPayslip, PayrollRun
 from .serializers import (
     SalaryContractSerializer,
     SalaryContractDetailSerializer,
+    SalaryContractSummarySerializer,
     MonthlyPayslipSerializer,
-    SalaryAdjustmentCreateSerializer
+    SalaryAdjustmentCreateSerializer,
+    BulkSalaryAdjustmentSerializer,
+    ContractRepriceSerializer,
+    PayrollCloseSerializer,
+    PayrollRunSerializer
 )
+from .services import apply_bulk_adjustment, reprice_payslips
+from .payroll import PayrollAlreadyClosed, close_payroll_month
+from .exports import EXPORT_FORMATS, stream_export
 from employees.permissions import IsCompanyOwner
+from idempotency.decorators import idempotent
+from ramcompany.pagination import StandardCursorPagination
+from ramcompany.principal import get_principal
+
+
+def _period_filters(query_params):
+    """
+    يقرأ فلاتر year و month من الرابط ويعيد (filters, errors).
+    """
+    filters = {}
+    errors = {}
+    for field, low, high in (('year', 2020, 9999), ('month', 1, 12)):
+        value = query_params.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            errors[field] = "يجب أن تكون القيمة رقماً صحيحاً."
+            continue
+        if not low <= value <= high:
+            errors[field] = f"يجب أن تكون القيمة بين {low} و {high}."
+            continue
+        filters[field] = value
+    return filters, errors
 
 # --- 1. واجهات خاصة بعقود الرواتب (SalaryContract) ---
 
@@ -18,15 +56,55 @@ from employees.permissions import IsCompanyOwner
 @permission_classes([IsAuthenticated, IsCompanyOwner])
 def salary_contract_list(request):
     """
-    [GET] لعرض قائمة بكل عقود الرواتب في شركة المدير الحالي.
+    [GET] لعرض قائمة عقود الرواتب في شركة المدير الحالي مع ترقيم الصفحات (cursor).
+    فلاتر اختيارية: year و month لتحديد كشوفات الرواتب المعروضة.
+    compact=1 يعرض مجاميع كل سنة بدلاً من كل كشف راتب وكل حركة.
     """
-    company = request.user.company_profile
-    contracts = SalaryContract.objects.filter(company=company)
-    serializer = SalaryContractDetailSerializer(contracts, many=True)
-    return Response(serializer.data)
+    company = get_principal(request).company
+    filters, errors = _period_filters(request.query_params)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    compact = request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+
+    contracts = SalaryContract.objects.filter(company=company).select_related('employee__user', 'company')
+    payslips = MonthlyPayslip.objects.filter(**filters)
+    paginator = StandardCursorPagination()
+
+    if compact:
+        page = paginator.paginate_queryset(contracts, request)
+        totals = {}
+        yearly_rows = (
+            payslips.filter(salary_contract__in=[contract.pk for contract in page])
+            .values('salary_contract_id', 'year')
+            .annotate(
+                payslips_count=Count('id'),
+                total_base_salary=Sum('base_monthly_salary'),
+                total_additions=Sum('total_additions'),
+                total_deductions=Sum('total_deductions'),
+                total_final_salary=Sum('final_salary')
+            )
+            .order_by('year')
+        )
+        for row in yearly_rows:
+            totals.setdefault(row.pop('salary_contract_id'), []).append(row)
+        for contract in page:
+            contract.yearly_totals = totals.get(contract.pk, [])
+        serializer = SalaryContractSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    contracts = contracts.prefetch_related(
+        Prefetch(
+            'payslips',
+            queryset=payslips.select_related('payroll_line').prefetch_related('adjustments').order_by('year', 'month')
+        )
+    )
+    page = paginator.paginate_queryset(contracts, request)
+    serializer = SalaryContractDetailSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsCompanyOwner])
+@idempotent('salaries.contract.create')
 def salary_contract_create(request):
     """
     [POST] لإنشاء عقد راتب جديد لموظف في الشركة.
@@ -44,7 +122,9 @@ def salary_contract_detail(request, pk):
     [GET] عرض تفاصيل عقد راتب معين.
     """
     try:
-        contract = SalaryContract.objects.get(pk=pk, company=request.user.company_profile)
+        contract = SalaryContract.objects.prefetch_related(
+            Prefetch('payslips', queryset=MonthlyPayslip.objects.select_related('payroll_line').prefetch_related('adjustments'))
+        ).get(pk=pk, company=get_principal(request).company)
     except SalaryContract.DoesNotExist:
         return Response({"detail": "عقد الراتب غير موجود أو لا ينتمي لشركتك."}, status=status.HTTP_404_NOT_FOUND)
     
@@ -56,20 +136,35 @@ def salary_contract_detail(request, pk):
 def salary_contract_update(request, pk):
     """
     [PUT/PATCH] تعديل عقد راتب معين.
+    عند تغيير الراتب السنوي أو نسبة السحب يتم تحديث كل كشوفات الرواتب غير المغلقة
+    ابتداءً من effective_from_month/effective_from_year (افتراضياً الشهر الحالي).
     """
     try:
-        contract = SalaryContract.objects.get(pk=pk, company=request.user.company_profile)
+        contract = SalaryContract.objects.get(pk=pk, company=get_principal(request).company)
     except SalaryContract.DoesNotExist:
         return Response({"detail": "عقد الراتب غير موجود أو لا ينتمي لشركتك."}, status=status.HTTP_404_NOT_FOUND)
 
+    effective = ContractRepriceSerializer(data=request.data)
+    if not effective.is_valid():
+        return Response(effective.errors, status=status.HTTP_400_BAD_REQUEST)
+    now = timezone.now()
+    effective_month = effective.validated_data.get('effective_from_month', now.month)
+    effective_year = effective.validated_data.get('effective_from_year', now.year)
+
     serializer = SalaryContractSerializer(
         instance=contract,
         data=request.data,
         partial=request.method == 'PATCH'
     )
     if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data)
+        with transaction.atomic():
+            contract = serializer.save()
+            repriced = 0
+            if {'yearly_salary', 'withdraw_allowed_percentage'} & contract.saved_changes.keys():
+                repriced = reprice_payslips([contract.pk], effective_year, effective_month)
+        data = dict(serializer.data)
+        data['repriced_payslips'] = repriced
+        return Response(data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -82,7 +177,10 @@ def monthly_payslip_detail(request, pk):
     [GET] عرض تفاصيل كشف راتب شهري معين.
     """
     try:
-        payslip = MonthlyPayslip.objects.get(pk=pk, salary_contract__company=request.user.company_profile)
+        payslip = MonthlyPayslip.objects.select_related('payroll_line').get(
+            pk=pk,
+            salary_contract__company=get_principal(request).company
+        )
     except MonthlyPayslip.DoesNotExist:
         return Response({"detail": "كشف الراتب غير موجود أو لا ينتمي لشركتك."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -94,18 +192,121 @@ def monthly_payslip_detail(request, pk):
 # (هذه الواجهة تبقى كما هي لأنها تخدم POST فقط)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsCompanyOwner])
+@idempotent('salaries.adjustment.create')
 def add_salary_adjustment(request, payslip_pk):
     """
     [POST] إضافة حركة جديدة (حسم أو مكافأة) على كشف راتب شهري معين.
     """
     try:
-        payslip = MonthlyPayslip.objects.get(pk=payslip_pk, salary_contract__company=request.user.company_profile)
+        payslip = MonthlyPayslip.objects.get(pk=payslip_pk, salary_contract__company=get_principal(request).company)
     except MonthlyPayslip.DoesNotExist:
         return Response({"detail": "كشف الراتب الذي تحاول التعديل عليه غير موجود."}, status=status.HTTP_404_NOT_FOUND)
-    
+    if payslip.is_locked:
+        return Response({"detail": "تم إغلاق رواتب هذا الشهر ولا يمكن إضافة حركات جديدة."}, status=status.HTTP_400_BAD_REQUEST)
+
     serializer = SalaryAdjustmentCreateSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(payslip=payslip)
+        try:
+            serializer.save(payslip=payslip)
+        except ValidationError:
+            return Response({"detail": "تم إغلاق رواتب هذا الشهر ولا يمكن إضافة حركات جديدة."}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+@idempotent('salaries.adjustment.bulk')
+def bulk_salary_adjustment(request):
+    """
+    [POST] إضافة نفس الحركة (حسم أو مكافأة) على عدة كشوفات رواتب لشهر معين دفعة واحدة.
+    الأهداف: employee_ids أو contract_ids، وإذا لم ترسل تطبق الحركة على كل موظفي الشركة.
+    """
+    serializer = BulkSalaryAdjustmentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    try:
+        results = apply_bulk_adjustment(
+            company=get_principal(request).company,
+            month=data['month'],
+            year=data['year'],
+            adjustment_type=data['adjustment_type'],
+            amount=data['amount'],
+            reason=data['reason'],
+            employee_ids=data.get('employee_ids'),
+            contract_ids=data.get('contract_ids')
+        )
+    except ValidationError:
+        return Response({"detail": "تم إغلاق رواتب هذا الشهر أثناء التنفيذ، لم يتم تطبيق أي حركة."}, status=status.HTTP_409_CONFLICT)
+    counts = {'applied': 0, 'locked': 0, 'not_found': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return Response(
+        dict(counts, results=results),
+        status=status.HTTP_201_CREATED if counts['applied'] else status.HTTP_200_OK
+    )
+
+
+# --- 4. واجهات خاصة بإغلاق رواتب الشهر (PayrollRun) ---
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+def payroll_close(request):
+    """
+    [POST] إغلاق رواتب شهر معين للشركة وحفظ نسخة ثابتة منها.
+    بعد الإغلاق لا يمكن إضافة حركات على كشوفات هذا الشهر.
+    """
+    serializer = PayrollCloseSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        run = close_payroll_month(
+            get_principal(request).company,
+            serializer.validated_data['month'],
+            serializer.validated_data['year'],
+            closed_by=request.user
+        )
+    except PayrollAlreadyClosed:
+        return Response({"detail": "رواتب هذا الشهر مغلقة مسبقاً."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(PayrollRunSerializer(run).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+def payroll_run_detail(request, year, month):
+    """
+    [GET] عرض النسخة الثابتة لرواتب شهر مغلق.
+    """
+    try:
+        run = PayrollRun.objects.select_related('closed_by').prefetch_related('lines').get(
+            company=get_principal(request).company,
+            month=month,
+            year=year
+        )
+    except PayrollRun.DoesNotExist:
+        return Response({"detail": "رواتب هذا الشهر لم يتم إغلاقها بعد."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(PayrollRunSerializer(run).data)
+
+
+# --- 5. تصدير بيانات الرواتب ---
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCompanyOwner])
+def payroll_export(request, year):
+    """
+    [GET] تصدير كشوفات الرواتب والحركات والسحوبات لسنة كاملة كـ stream.
+    output=csv (افتراضي) أو output=ndjson.
+    """
+    export_format = request.query_params.get('output', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({"detail": "صيغة التصدير يجب أن تكون csv أو ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+    company = get_principal(request).company
+    response = StreamingHttpResponse(
+        stream_export(company, year, export_format),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="payroll-{company.pk}-{year}.{export_format}"'
+    return response
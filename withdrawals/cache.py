@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.db import DatabaseCache
+
+SUMMARY_PREFIX = 'withdrawals:summary'
+
+# Metrics are kept per process so that reading the summary does not cost extra cache writes.
+_metrics_lock = threading.Lock()
+_metrics = {'hits': 0, 'misses': 0, 'invalidations': 0, 'hit_age_total': 0.0}
+
+
+def _summary_ttl():
+    return getattr(settings, 'WITHDRAWAL_SUMMARY_CACHE_TTL', 300)
+
+
+def _employee_version_key(employee_id):
+    return f'{SUMMARY_PREFIX}:employee:{employee_id}:version'
+
+
+def _company_version_key(company_id):
+    return f'{SUMMARY_PREFIX}:company:{company_id}:version'
+
+
+def summary_cache_enabled():
+    """
+    The summary is one indexed SELECT, a database cache would cost more queries than it saves.
+    """
+    return _summary_ttl() > 0 and not isinstance(caches[DEFAULT_CACHE_ALIAS], DatabaseCache)
+
+
+def _record(name, value=1):
+    with _metrics_lock:
+        _metrics[name] += value
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _summary_key(employee_id, year, month):
+    return f'{SUMMARY_PREFIX}:{employee_id}:{year}-{month}'
+
+
+def get_cached_summary(employee, year, month):
+    """
+    Return (key, summary). summary is None on a miss, key is used to store the fresh value.
+
+    The entry and the employee and company versions are read in one get_many. An entry
+    stored under older versions is a miss, so bumping a version is enough to invalidate it.
+    """
+    if not summary_cache_enabled():
+        return None, None
+    company_id = employee.company_id or 0
+    key = _summary_key(employee.pk, year, month)
+    employee_version_key = _employee_version_key(employee.pk)
+    company_version_key = _company_version_key(company_id)
+    values = cache.get_many([key, employee_version_key, company_version_key])
+    versions = (company_id, values.get(company_version_key, 0), values.get(employee_version_key, 0))
+    entry = values.get(key)
+    if entry is None or entry['versions'] != versions:
+        _record('misses')
+        return (key, versions), None
+    _record('hits')
+    _record('hit_age_total', time.time() - entry['cached_at'])
+    return (key, versions), entry['summary']
+
+
+def set_cached_summary(key, summary):
+    if key is None:
+        return
+    key, versions = key
+    cache.set(key, {'summary': summary, 'versions': versions, 'cached_at': time.time()}, _summary_ttl())
+
+
+def invalidate_employee_summary(employee_id):
+    _incr(_employee_version_key(employee_id))
+    _record('invalidations')
+
+
+def invalidate_company_summaries(company_ids):
+    for company_id in company_ids:
+        _incr(_company_version_key(company_id))
+        _record('invalidations')
+
+
+def summary_cache_metrics():
+    """
+    Hit rate and staleness (average age of the entries served from the cache) of this process.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    hit_age_total = metrics.pop('hit_age_total')
+    lookups = metrics['hits'] + metrics['misses']
+    metrics['lookups'] = lookups
+    metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0.0
+    metrics['average_hit_age_seconds'] = round(hit_age_total / metrics['hits'], 3) if metrics['hits'] else 0.0
+    metrics['ttl_seconds'] = _summary_ttl()
+    metrics['enabled'] = summary_cache_enabled()
+    return metrics
+
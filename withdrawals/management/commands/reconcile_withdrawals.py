@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from salaries.models import MonthlyPayslip
+from withdrawals.services import find_counter_drift, reconcile_withdrawn_totals
+
+
+class Command(BaseCommand):
+    help = "Check the withdrawn total counter of payslips against their withdrawal rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--month', type=int)
+        parser.add_argument('--fix', action='store_true', help="Reset the drifted counters from the withdrawal rows")
+
+    def handle(self, *args, **options):
+        payslips = MonthlyPayslip.objects.all()
+        if options['year']:
+            payslips = payslips.filter(year=options['year'])
+        if options['month']:
+            payslips = payslips.filter(month=options['month'])
+
+        drifted = list(
+            find_counter_drift(payslips).values_list('pk', 'withdrawn_total', 'actual_withdrawn')
+        )
+        if not drifted:
+            self.stdout.write("All withdrawal counters are consistent.")
+            return
+
+        for payslip_id, counter, actual in drifted:
+            self.stdout.write(f"Payslip {payslip_id}: counter {counter}, withdrawals {actual}")
+        if options['fix']:
+            fixed = reconcile_withdrawn_totals(MonthlyPayslip.objects.filter(pk__in=[row[0] for row in drifted]))
+            self.stdout.write(self.style.SUCCESS(f"Successfully reconciled {fixed} payslips."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} payslips drifted, run with --fix to reconcile them."))
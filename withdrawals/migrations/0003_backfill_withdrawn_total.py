@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:52
+
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_withdrawn_total(apps, schema_editor):
+    MonthlyPayslip = apps.get_model('salaries', 'MonthlyPayslip')
+    Withdrawal = apps.get_model('withdrawals', 'Withdrawal')
+    total = Withdrawal.objects.filter(
+        payslip=OuterRef('pk')
+    ).values('payslip').annotate(total=Sum('amount')).values('total')
+    MonthlyPayslip.objects.update(
+        withdrawn_total=Coalesce(
+            Subquery(total),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salaries', '0006_monthlypayslip_withdrawal_counter'),
+        ('withdrawals', '0002_rename_payslib_withdrawal_payslip'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_withdrawn_total, migrations.RunPython.noop),
+    ]
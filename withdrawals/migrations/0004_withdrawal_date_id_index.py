@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('salaries', '0006_monthlypayslip_withdrawal_counter'),
+        ('withdrawals', '0003_backfill_withdrawn_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['date', 'id'], name='withdrawals_date_1354e4_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from salaries.models import MonthlyPayslip
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
@@ -8,11 +9,39 @@ class Withdrawal (models.Model):
     payslip = models.ForeignKey(MonthlyPayslip , on_delete = models.PROTECT , related_name="withdrawals")
     amount = models.DecimalField(max_digits=10 , decimal_places=2)
     date = models.DateField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id']),
+        ]
+
     def clean(self):
         allowed_percentage= self.payslip.salary_contract.withdraw_allowed_percentage
         allowed_amount = self.payslip.base_monthly_salary * (allowed_percentage / 100)
         if self.amount > allowed_amount:
             raise ValidationError(f"your amount not allowed {allowed_amount}")
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            with transaction.atomic():
+                # التحقق من الحد وحجز المبلغ في استعلام واحد، حتى لا يتجاوز طلبان متزامنان الحد المسموح
+                reserved = MonthlyPayslip.objects.filter(
+                    pk=self.payslip_id,
+                    withdrawn_total__lte=F('withdrawal_limit') - self.amount
+                ).update(withdrawn_total=F('withdrawn_total') + self.amount)
+                if not reserved:
+                    raise ValidationError("This withdrawal exceeds the allowed limit of the payslip.")
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            MonthlyPayslip.objects.filter(pk=self.payslip_id).update(
+                withdrawn_total=F('withdrawn_total') - self.amount
+            )
+        return result
+
     def __str__(self):
         return f"withdrawal {self.amount} from your salary{self.payslip.id} في {self.date}"
 
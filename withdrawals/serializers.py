@@ -1,10 +1,11 @@
+from decimal import Decimal
 from rest_framework import serializers
 from .models import Withdrawal
 
 class WithdrawalSerializer(serializers.ModelSerializer):
     withdrawal_id = serializers.IntegerField(source='id' ,read_only= True)
-    payslib_id = serializers.IntegerField(source = 'id' , read_only = True)
-    employee_id = serializers.IntegerField(source='payslip.salary_contract.employee.id', read_only=True)
+    payslib_id = serializers.IntegerField(source = 'payslip_id' , read_only = True)
+    employee_id = serializers.IntegerField(source='payslip.salary_contract.employee_id', read_only=True)
     employee_username = serializers.CharField(source='payslip.salary_contract.employee.user.username', read_only=True)
     class Meta:
         model = Withdrawal
@@ -37,5 +38,8 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Withdrawal
         fields = ['amount']
+        extra_kwargs = {
+            'amount': {'min_value': Decimal('0.01')},
+        }
 
 
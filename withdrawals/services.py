@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from salaries.models import MonthlyPayslip
+from .cache import invalidate_employee_summary
+from .models import Withdrawal
+
+
+def withdrawals_total():
+    """
+    مجموع السحوبات الفعلي لكل كشف راتب كاستعلام فرعي.
+    """
+    total = Withdrawal.objects.filter(
+        payslip=OuterRef('pk')
+    ).values('payslip').annotate(total=Sum('amount')).values('total')
+    return Coalesce(
+        Subquery(total),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def find_counter_drift(payslips=None):
+    """
+    يعيد الكشوفات التي لا يساوي فيها عداد السحوبات مجموع سجلات Withdrawal.
+    """
+    if payslips is None:
+        payslips = MonthlyPayslip.objects.all()
+    return payslips.annotate(actual_withdrawn=withdrawals_total()).exclude(
+        withdrawn_total=F('actual_withdrawn')
+    )
+
+
+def reconcile_withdrawn_totals(payslips):
+    """
+    يعيد ضبط عداد السحوبات من سجلات Withdrawal بعملية UPDATE واحدة.
+    ملخصات الموظفين المعنيين تُبطل بعد الحفظ.
+    """
+    employee_ids = list(payslips.values_list('salary_contract__employee_id', flat=True).distinct())
+    updated = payslips.update(withdrawn_total=withdrawals_total())
+
+    def invalidate():
+        for employee_id in employee_ids:
+            invalidate_employee_summary(employee_id)
+
+    transaction.on_commit(invalidate)
+    return updated
@@ -1,3 +1,156 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from companies.models import Company
+from employees.models import Employee
+from salaries.models import MonthlyPayslip, SalaryContract
+from .cache import get_cached_summary, set_cached_summary
+from .models import Withdrawal
+from .services import find_counter_drift, reconcile_withdrawn_totals
+
+
+def create_payslip(username='employee', phone_number='+963944000001'):
+    """
+    The current-month payslip of a new contract: salary 1000.00, withdrawal limit 500.00.
+    """
+    company = Company.objects.create(
+        owner=User.objects.create_user(f'{username}-owner'),
+        name=f'{username} company',
+        phone_number=phone_number
+    )
+    employee = Employee.objects.create(user=User.objects.create_user(username), company=company)
+    contract = SalaryContract.objects.create(
+        employee=employee,
+        company=company,
+        yearly_salary=Decimal('12000.00'),
+        withdraw_allowed_percentage=50
+    )
+    now = timezone.now()
+    return MonthlyPayslip.objects.get(salary_contract=contract, month=now.month, year=now.year)
+
+
+class WithdrawalReservationTests(TestCase):
+
+    def setUp(self):
+        self.payslip = create_payslip()
+
+    def withdrawn_total(self):
+        return MonthlyPayslip.objects.values_list('withdrawn_total', flat=True).get(pk=self.payslip.pk)
+
+    def test_withdrawal_reserves_the_amount(self):
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('200.00'))
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('300.00'))
+        self.assertEqual(self.withdrawn_total(), Decimal('500.00'))
+
+    def test_withdrawal_over_the_limit_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('500.01'))
+        self.assertFalse(Withdrawal.objects.exists())
+        self.assertEqual(self.withdrawn_total(), Decimal('0.00'))
+
+    def test_withdrawal_over_the_remaining_amount_is_rejected(self):
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('450.00'))
+        with self.assertRaises(ValidationError):
+            Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('50.01'))
+        self.assertEqual(Withdrawal.objects.count(), 1)
+        self.assertEqual(self.withdrawn_total(), Decimal('450.00'))
+
+    def test_reservation_checks_the_stored_total_not_a_stale_copy(self):
+        # Two requests that both read the payslip before either one reserved
+        first = Withdrawal(payslip=self.payslip, amount=Decimal('300.00'))
+        second = Withdrawal(payslip=self.payslip, amount=Decimal('300.00'))
+        first.save()
+        with self.assertRaises(ValidationError):
+            second.save()
+        self.assertEqual(self.withdrawn_total(), Decimal('300.00'))
+
+    def test_deleting_a_withdrawal_releases_the_amount(self):
+        withdrawal = Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('500.00'))
+        withdrawal.delete()
+        self.assertEqual(self.withdrawn_total(), Decimal('0.00'))
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('500.00'))
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite locks the whole table, concurrent writers fail instead of racing")
+class ConcurrentWithdrawalTests(TransactionTestCase):
+
+    def test_concurrent_withdrawals_never_exceed_the_limit(self):
+        payslip = create_payslip()
+        workers = 6
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def withdraw():
+            close_old_connections()
+            try:
+                barrier.wait()
+                Withdrawal.objects.create(payslip_id=payslip.pk, amount=Decimal('150.00'))
+                outcomes.append('reserved')
+            except ValidationError:
+                outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=withdraw) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        payslip.refresh_from_db()
+        self.assertEqual(outcomes.count('reserved'), 3)
+        self.assertEqual(Withdrawal.objects.filter(payslip=payslip).count(), 3)
+        self.assertEqual(payslip.withdrawn_total, Decimal('450.00'))
+
+
+class ReconcileWithdrawnTotalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.payslip = create_payslip()
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('120.00'))
+        Withdrawal.objects.create(payslip=self.payslip, amount=Decimal('30.00'))
+
+    def test_consistent_counters_are_not_reported(self):
+        self.assertFalse(find_counter_drift().exists())
+
+    def test_drifted_counter_is_reset_from_the_withdrawal_rows(self):
+        MonthlyPayslip.objects.filter(pk=self.payslip.pk).update(withdrawn_total=Decimal('999.00'))
+        drifted = find_counter_drift().get()
+        self.assertEqual((drifted.pk, drifted.actual_withdrawn), (self.payslip.pk, Decimal('150.00')))
+
+        self.assertEqual(reconcile_withdrawn_totals(MonthlyPayslip.objects.filter(pk=self.payslip.pk)), 1)
+        self.payslip.refresh_from_db()
+        self.assertEqual(self.payslip.withdrawn_total, Decimal('150.00'))
+        self.assertFalse(find_counter_drift().exists())
+
+    def test_payslip_without_withdrawals_is_reset_to_zero(self):
+        other = create_payslip('other', '+963944000002')
+        MonthlyPayslip.objects.filter(pk=other.pk).update(withdrawn_total=Decimal('10.00'))
+        reconcile_withdrawn_totals(find_counter_drift())
+        other.refresh_from_db()
+        self.assertEqual(other.withdrawn_total, Decimal('0.00'))
+
+    def test_fix_command_invalidates_the_cached_summary(self):
+        employee = self.payslip.salary_contract.employee
+        now = timezone.now()
+        key, summary = get_cached_summary(employee, now.year, now.month)
+        set_cached_summary(key, {'total_withdrawn_amount': Decimal('999.00')})
+        self.assertIsNotNone(get_cached_summary(employee, now.year, now.month)[1])
+        MonthlyPayslip.objects.filter(pk=self.payslip.pk).update(withdrawn_total=Decimal('999.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_withdrawals', '--fix', stdout=StringIO())
+
+        self.assertFalse(find_counter_drift().exists())
+        self.assertIsNone(get_cached_summary(employee, now.year, now.month)[1])
@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('create/', views.create_withdrawal , name = "create-withdrawal" ),
     path('' , views.get_all_withdrawals , name = "get-all-withdrawals"),
-    path('get/detail/' ,views.get_withdrawal_summery , name= "get-all-details")
+    path('get/detail/' ,views.get_withdrawal_summery , name= "get-all-details"),
+    path('get/detail/metrics/' ,views.withdrawal_summary_cache_metrics , name= "summary-cache-metrics")
 ]
@@ -1,28 +1,37 @@
 from django.shortcuts import render
-from rest_framework.decorators import api_view , permission_classes
+from rest_framework.decorators import api_view , permission_classes , throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated ,AllowAny
+from rest_framework.permissions import IsAuthenticated ,AllowAny ,IsAdminUser
 from .models import Withdrawal
 from .serializers import WithdrawalSerializer ,WithdrawalCreateSerializer
-from .permissions import IsCompanyOrEmployee
+from .permissions import IsCompanyOrEmployee, IsEmployee
+from ramcompany.principal import get_principal
+from .cache import get_cached_summary, set_cached_summary, invalidate_employee_summary, summary_cache_metrics
 from decimal import Decimal
 from django.utils import timezone
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from salaries.models import MonthlyPayslip
+from idempotency.decorators import idempotent
+from ramcompany.throttling import WithdrawalRateThrottle
+from ramcompany.pagination import KeysetPagination
 
 
 
 @api_view(['POST'])
-@permission_classes([IsCompanyOrEmployee , IsAuthenticated])
+@permission_classes([IsAuthenticated , IsEmployee])
+@throttle_classes([WithdrawalRateThrottle])
+@idempotent('withdrawals.create')
 def create_withdrawal(request):
-    employee = request.user.employee_profile
+    employee = get_principal(request).employee
     current_date = timezone.now()
     current_month = current_date.month
     current_year = current_date.year
 
     try:
-        payslip = MonthlyPayslip.objects.get(
+        payslip = MonthlyPayslip.objects.select_related('salary_contract__employee__user').get(
             salary_contract__employee=employee,
             month=current_month,
             year=current_year
@@ -32,19 +41,16 @@ def create_withdrawal(request):
 
     serializer = WithdrawalCreateSerializer(data=request.data)
     if serializer.is_valid():
-        new_amount = serializer.validated_data['amount']
-        allowed_percentage = payslip.salary_contract.withdraw_allowed_percentage
-        allowed_amount = payslip.base_monthly_salary * (Decimal(allowed_percentage) / 100)
-        total_withdrawn = Withdrawal.objects.filter(payslip=payslip).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-        if (total_withdrawn + new_amount) > allowed_amount:
-            remaining_amount = allowed_amount - total_withdrawn
+        try:
+            withdrawal = serializer.save(payslip=payslip)
+            transaction.on_commit(lambda: invalidate_employee_summary(employee.pk))
+        except ValidationError:
+            payslip.refresh_from_db(fields=['withdrawal_limit', 'withdrawn_total'])
+            remaining_amount = payslip.withdrawal_limit - payslip.withdrawn_total
             return Response(
                 {"detail": f"your money order is more than allowed {remaining_amount}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        withdrawal = serializer.save(payslip=payslip)
         response_serializer = WithdrawalSerializer(withdrawal)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -52,43 +58,90 @@ def create_withdrawal(request):
 
 
 
+class WithdrawalKeysetPagination(KeysetPagination):
+    ordering = ('-date', '-id')
+
+
+def _withdrawal_filters(query_params, is_company):
+    filters = {}
+    errors = {}
+    for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+        value = query_params.get(param)
+        if value:
+            try:
+                parsed = parse_date(value) if len(value) == 10 else None
+            except ValueError:
+                # Well formed but impossible, like 2026-02-30
+                parsed = None
+            if parsed is None:
+                errors[param] = "Date has wrong format. Use YYYY-MM-DD."
+            else:
+                filters[lookup] = parsed
+    params = [('month', 'payslip__month'), ('year', 'payslip__year')]
+    if is_company:
+        params.append(('employee_id', 'payslip__salary_contract__employee_id'))
+    for param, lookup in params:
+        value = query_params.get(param)
+        if value:
+            if not value.isdigit():
+                errors[param] = "A valid integer is required."
+            else:
+                filters[lookup] = int(value)
+    return filters, errors
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated ,IsCompanyOrEmployee])
 def get_all_withdrawals (request):
-    user = request.user 
-    if hasattr(user, 'employee_profile'):
-        payslips = MonthlyPayslip.objects.filter(salary_contract__employee=user.employee_profile)
-        withdrawals = Withdrawal.objects.filter(payslip__in=payslips)
-    elif hasattr(user, 'company_profile'):
-        payslips = MonthlyPayslip.objects.filter(salary_contract__company=user.company_profile)
-        withdrawals = Withdrawal.objects.filter(payslip__in=payslips)
+    principal = get_principal(request)
+    if principal.is_employee:
+        withdrawals = Withdrawal.objects.filter(payslip__salary_contract__employee_id=principal.employee_id)
+        is_company = False
+    elif principal.is_company_owner:
+        withdrawals = Withdrawal.objects.filter(payslip__salary_contract__company_id=principal.company_id)
+        is_company = True
     else:
         return Response({"detail": "User has no employee or company profile."}, status=status.HTTP_403_FORBIDDEN)
 
-    serializer = WithdrawalSerializer(withdrawals, many=True)
-    return Response(serializer.data)
+    filters, errors = _withdrawal_filters(request.query_params, is_company)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    withdrawals = withdrawals.filter(**filters).select_related(
+        'payslip__salary_contract__employee__user'
+    ).only(
+        'amount', 'date', 'payslip__salary_contract__employee__user__username',
+        'payslip', 'payslip__salary_contract', 'payslip__salary_contract__employee'
+    )
+    paginator = WithdrawalKeysetPagination()
+    page = paginator.paginate_queryset(withdrawals, request)
+    serializer = WithdrawalSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 
 
 @api_view(['GET'])
-@permission_classes([IsCompanyOrEmployee])
+@permission_classes([IsAuthenticated , IsEmployee])
 def get_withdrawal_summery(request):
-    employee = request.user.employee_profile
+    employee = get_principal(request).employee
     current_date = timezone.now()
     current_month = current_date.month
     current_year = current_date.year
+    cache_key, summary_data = get_cached_summary(employee, current_year, current_month)
+    if summary_data is not None:
+        return Response(summary_data, status=status.HTTP_200_OK)
     try:
-        payslip = MonthlyPayslip.objects.get(
+        payslip = MonthlyPayslip.objects.only(
+            'base_monthly_salary', 'withdrawal_limit', 'withdrawn_total'
+        ).get(
             salary_contract__employee=employee,
             month=current_month,
             year=current_year
         )
     except MonthlyPayslip.DoesNotExist:
             return Response({"detail": "you dont have any contract for this month"}, status=status.HTTP_404_NOT_FOUND)
-    allowed_percentage_rate = payslip.salary_contract.withdraw_allowed_percentage
-    allowed_amount = payslip.base_monthly_salary * (Decimal(allowed_percentage_rate) / 100)
-    total_withdrawn = Withdrawal.objects.filter(payslip=payslip).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    allowed_amount = payslip.withdrawal_limit
+    total_withdrawn = payslip.withdrawn_total
     remaining_amount = allowed_amount - total_withdrawn
     if allowed_amount > 0:
             withdrawn_percentage = round((total_withdrawn / allowed_amount) * 100, 2)
@@ -104,5 +157,12 @@ def get_withdrawal_summery(request):
         'withdrawn_percentage': f"{withdrawn_percentage}%",
         'remaining_percentage': f"{remaining_percentage}%",
     }
+    set_cached_summary(cache_key, summary_data)
 
     return Response(summary_data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def withdrawal_summary_cache_metrics(request):
+    return Response(summary_cache_metrics(), status=status.HTTP_200_OK)